@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+# Pools are shared by clients routing to the same hosts, so health marks and
+# latency statistics outlive the per-request pipelines that create clients
+_pools: Dict[Tuple[Tuple[str, ...], float, float], "HostPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class HostState:
+    """
+    Routing state and latency statistics for a single Ollama host.
+    """
+
+    def __init__(self, url: str):
+        """
+        Initialize the host state.
+
+        Args:
+            url: Base URL of the Ollama host
+        """
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.healthy = True
+        self.probing = False
+        self.last_failure = 0.0
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.ewma_latency: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get a snapshot of this host's statistics."""
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency": self.total_latency / self.completed if self.completed else None,
+            "ewma_latency": self.ewma_latency,
+            "max_latency": self.max_latency
+        }
+
+
+class HostPool:
+    """
+    Routes requests across several Ollama hosts.
+
+    Each request goes to the healthy host with the fewest in-flight requests.
+    Hosts that fail are marked unhealthy and re-probed in the background until
+    they respond again.
+    """
+
+    def __init__(self,
+                 hosts: List[str],
+                 session: requests.Session,
+                 probe_interval: float = 30.0,
+                 probe_timeout: float = 5.0):
+        """
+        Initialize the host pool.
+
+        Args:
+            hosts: Base URLs of the Ollama hosts
+            session: HTTP session used for health probes
+            probe_interval: Seconds between probes of an unhealthy host
+            probe_timeout: Timeout in seconds for a health probe
+        """
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.hosts = [HostState(url) for url in hosts]
+        self.session = session
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Optional[List[HostState]] = None) -> Optional[HostState]:
+        """
+        Pick a host for a request and count it as in flight.
+
+        Args:
+            exclude: Hosts already tried for this request
+
+        Returns:
+            The selected host, or None if every host has been excluded
+        """
+        exclude = exclude or []
+        with self._lock:
+            candidates = [host for host in self.hosts if host not in exclude]
+            if not candidates:
+                return None
+
+            for host in candidates:
+                if not host.healthy and not host.probing \
+                        and time.monotonic() - host.last_failure >= self.probe_interval:
+                    self._start_probe(host)
+
+            healthy = [host for host in candidates if host.healthy]
+            if healthy:
+                host = min(healthy, key=lambda h: h.in_flight)
+            else:
+                # Nothing is known to be up, so try the host that failed longest ago
+                host = min(candidates, key=lambda h: h.last_failure)
+            host.in_flight += 1
+            host.requests += 1
+            return host
+
+    def release(self, host: HostState, latency: Optional[float] = None, error: bool = False) -> None:
+        """
+        Record the outcome of a request started with acquire.
+
+        Args:
+            host: The host returned by acquire
+            latency: Request duration in seconds, if it completed
+            error: Whether the host failed to serve the request
+        """
+        with self._lock:
+            host.in_flight -= 1
+            if error:
+                host.errors += 1
+                host.last_failure = time.monotonic()
+                if host.healthy:
+                    logging.warning(f"Marking Ollama host {host.url} as unhealthy")
+                host.healthy = False
+            elif latency is not None:
+                host.healthy = True
+                host.completed += 1
+                host.total_latency += latency
+                host.max_latency = max(host.max_latency, latency)
+                host.ewma_latency = latency if host.ewma_latency is None \
+                    else 0.8 * host.ewma_latency + 0.2 * latency
+
+    def probe(self, host: HostState) -> bool:
+        """
+        Check whether a host is reachable and update its health.
+
+        Args:
+            host: The host to probe
+
+        Returns:
+            bool: True if the host responded
+        """
+        try:
+            healthy = self.session.get(f"{host.url}/api/tags", timeout=self.probe_timeout).status_code == 200
+        except requests.RequestException:
+            healthy = False
+
+        with self._lock:
+            host.probing = False
+            if healthy:
+                if not host.healthy:
+                    logging.info(f"Ollama host {host.url} is healthy again")
+                host.healthy = True
+            else:
+                host.last_failure = time.monotonic()
+        return healthy
+
+    def _start_probe(self, host: HostState) -> None:
+        """Probe an unhealthy host in the background. Must be called with the lock held."""
+        host.probing = True
+        threading.Thread(target=self.probe, args=(host,), name="ollama-probe", daemon=True).start()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-host routing and latency statistics.
+
+        Returns:
+            Dict mapping host URLs to their statistics
+        """
+        with self._lock:
+            return {host.url: host.stats() for host in self.hosts}
+
+
+def get_host_pool(hosts: List[str],
+                  session: requests.Session,
+                  probe_interval: float = 30.0,
+                  probe_timeout: float = 5.0) -> HostPool:
+    """
+    Get the host pool shared by all clients of the same hosts.
+
+    Args:
+        hosts: Base URLs of the Ollama hosts
+        session: HTTP session used for health probes, when the pool is created
+        probe_interval: Seconds between probes of an unhealthy host
+        probe_timeout: Timeout in seconds for a health probe
+
+    Returns:
+        HostPool: The pool for those hosts and probe settings
+    """
+    key = (tuple(url.rstrip("/") for url in hosts), probe_interval, probe_timeout)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = HostPool(hosts, session, probe_interval=probe_interval, probe_timeout=probe_timeout)
+            _pools[key] = pool
+        return pool
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+_policies: Dict[Tuple, "ModelTierPolicy"] = {}
+_policies_lock = threading.Lock()
+
+
+class ModelTierPolicy:
+    """
+    Chooses between models ordered from most to least expensive based on load.
+
+    A model is skipped while it has too many requests in flight or its recent
+    p95 latency is above the threshold, so requests drop to a faster model at
+    peaks. Latency samples expire, so the preferred model is tried again once
+    load goes down.
+    """
+
+    def __init__(self,
+                 models: List[str],
+                 max_queue_depth: int = 2,
+                 p95_threshold: float = 60.0,
+                 window_seconds: float = 300.0,
+                 min_samples: int = 5):
+        """
+        Initialize the policy.
+
+        Args:
+            models: Model identifiers, most capable (and slowest) first
+            max_queue_depth: Maximum in-flight requests before a model is skipped
+            p95_threshold: p95 latency in seconds above which a model is skipped
+            window_seconds: How long latency samples count towards the p95
+            min_samples: Number of samples needed before the p95 is trusted
+        """
+        if not models:
+            raise ValueError("At least one model is required")
+        self.models = list(models)
+        self.max_queue_depth = max_queue_depth
+        self.p95_threshold = p95_threshold
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self._in_flight = {model: 0 for model in self.models}
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {model: deque() for model in self.models}
+        self._lock = threading.Lock()
+
+    def _p95(self, model: str) -> Optional[float]:
+        """Get the recent p95 latency of a model. Must be called with the lock held."""
+        samples = self._latencies[model]
+        cutoff = time.monotonic() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        if len(samples) < self.min_samples:
+            return None
+        latencies = sorted(latency for _, latency in samples)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def acquire(self) -> str:
+        """
+        Pick the most capable model that is not overloaded and count a request to it as in flight.
+
+        Choosing and reserving happen under one lock, so concurrent requests
+        cannot all take the last free slot of a model. Every call must be
+        followed by release().
+
+        Returns:
+            str: The model to use; the cheapest model if all are overloaded
+        """
+        with self._lock:
+            model = self.models[-1]
+            for candidate in self.models[:-1]:
+                p95 = self._p95(candidate)
+                if self._in_flight[candidate] < self.max_queue_depth and (p95 is None or p95 <= self.p95_threshold):
+                    model = candidate
+                    break
+            self._in_flight[model] += 1
+            return model
+
+    def release(self, model: str, latency: Optional[float] = None) -> None:
+        """
+        Record the end of a request started with acquire.
+
+        Args:
+            model: The model returned by acquire
+            latency: Seconds the request took if it succeeded; failed, timed out
+                and cached requests pass None, so they do not skew the p95
+        """
+        with self._lock:
+            self._in_flight[model] -= 1
+            if latency is not None:
+                self._latencies[model].append((time.monotonic(), latency))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-model load statistics.
+
+        Returns:
+            Dict mapping models to their in-flight count and p95 latency
+        """
+        with self._lock:
+            return {model: {"in_flight": self._in_flight[model], "p95_latency": self._p95(model)}
+                    for model in self.models}
+
+
+def get_policy(models: List[str], **kwargs) -> ModelTierPolicy:
+    """
+    Get the process-wide policy for a list of models.
+
+    Load must be measured across all clients, so clients using the same models
+    and thresholds share one policy.
+
+    Args:
+        models: Model identifiers, most capable first
+        **kwargs: Thresholds passed to ModelTierPolicy
+
+    Returns:
+        ModelTierPolicy: The shared policy
+    """
+    key = (tuple(models), tuple(sorted(kwargs.items())))
+    with _policies_lock:
+        policy = _policies.get(key)
+        if policy is None:
+            policy = ModelTierPolicy(models, **kwargs)
+            _policies[key] = policy
+            logging.info(f"Model tiering enabled for {models}")
+        return policy
@@ -1,8 +1,132 @@
 import json
 import logging
+import os
 import requests
 import re
-from typing import Dict, Any, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from core.llm.host_pool import get_host_pool
+from core.llm.model_tiering import get_policy
+from core.llm.prompt_scorer import score_prompt
+from core.llm.response_cache import ResponseCache
+from core.llm.stream_cleaner import StreamCleaner
+from core.llm.vocabulary import get_matcher
+from core.utils.metrics import metrics
+
+# Sessions are shared between client instances so that pipelines created per
+# request still reuse pooled keep-alive connections to the Ollama server.
+_sessions: Dict[Tuple[int, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Token and timing fields reported by Ollama with a finished generation (durations in nanoseconds)
+GENERATION_STAT_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count",
+                          "eval_duration", "load_duration", "total_duration")
+
+# Load times above this many seconds mean the model had to be loaded into memory
+COLD_LOAD_SECONDS = 1.0
+
+ENHANCE_SYSTEM_PROMPT = """You are an expert at creating detailed, vivid descriptions for image generation.
+Take the user's basic prompt and enhance it with specific details about:
+- Lighting, colors, and atmosphere
+- Detailed visual elements
+- Style, mood, and artistic direction
+Your output should ONLY be the enhanced prompt text, with no explanations or additional text."""
+
+# Static instructions come first so they form a prefix shared by every request
+CREATIVE_SYSTEM_PROMPT = """You are a creative AI assisting with generating detailed descriptions for visual content.
+Please enhance the user's prompt with specific details about:
+1. Visual details (colors, lighting, composition)
+2. Style references
+3. Mood and atmosphere
+
+Your output should be ONLY the enhanced, detailed description with no explanations or additional text.
+"""
+
+
+class ConnectionRetry(Retry):
+    """
+    Retry policy that never re-sends a request after a read timeout.
+
+    A generation that timed out may still be running on the server, so sending
+    it again would only queue a second copy behind it. Connection errors and
+    resets are retried as usual.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            raise error
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def get_shared_session(pool_size: int = 10, max_retries: int = 3) -> requests.Session:
+    """
+    Get a process-wide HTTP session with connection pooling and retries.
+    
+    Args:
+        pool_size: Maximum number of pooled connections per host
+        max_retries: Number of retries on connection errors and resets
+        
+    Returns:
+        requests.Session: Session shared by all callers using the same settings
+    """
+    key = (pool_size, max_retries)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            # Resets of pooled keep-alive connections are retried for POSTs too, but
+            # a request that timed out waiting for its response never is
+            retry = ConnectionRetry(
+                total=max_retries,
+                connect=max_retries,
+                read=max_retries,
+                status=0,
+                backoff_factor=0.2,
+                allowed_methods=frozenset(["GET", "POST"]),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def default_ollama_host() -> str:
+    """
+    Get the Ollama host URL for the current environment.
+    
+    Returns:
+        str: host.docker.internal when running in Docker, localhost otherwise
+    """
+    # Check if running in Docker
+    if os.path.exists('/.dockerenv'):
+        # Use host.docker.internal to access host machine
+        return "http://host.docker.internal:11434"
+    # Default for local execution
+    return "http://localhost:11434"
+
+
+def ollama_hosts() -> List[str]:
+    """
+    Get the Ollama hosts to balance requests across.
+    
+    Set OLLAMA_HOSTS to a comma-separated list of base URLs to use several
+    hosts; otherwise the single default host is used.
+    
+    Returns:
+        List[str]: Host URLs
+    """
+    hosts = [host.strip() for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+    return hosts or [default_ollama_host()]
+
 
 class OllamaClient:
     """
@@ -12,17 +136,328 @@ class OllamaClient:
     particularly focused on enhancing prompts for creative applications.
     """
     
-    def __init__(self, host: str = "http://localhost:11434", model: str = "deepseek-r1:latest"):
+    def __init__(self,
+                 host: Union[str, List[str]] = "http://localhost:11434",
+                 model: str = "deepseek-r1:latest",
+                 pool_size: int = 10,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 300.0,
+                 max_retries: int = 3,
+                 stream: bool = False,
+                 stream_token_budget: int = 2048,
+                 options: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None,
+                 keep_alive: str = "30m",
+                 probe_interval: float = 30.0,
+                 prefix_cache: bool = True,
+                 vocabulary_path: Optional[str] = None,
+                 fallback_models: Optional[List[str]] = None,
+                 max_queue_depth: int = 2,
+                 p95_threshold: float = 60.0,
+                 embedding_model: str = "nomic-embed-text"):
         """
         Initialize the Ollama client.
         
         Args:
-            host: The host URL where Ollama is running
+            host: The host URL where Ollama is running, or a list of hosts to balance across
             model: The model identifier to use for generations
+            pool_size: Maximum number of keep-alive connections to the Ollama server
+            connect_timeout: Seconds to wait when establishing a connection
+            read_timeout: Seconds to wait for the server to send a response
+            max_retries: Number of retries on connection errors and resets
+            stream: Consume the token stream, cleaning the output as tokens arrive
+            stream_token_budget: Maximum number of streamed tokens to read per request
+            options: Ollama generation options, e.g. {"seed": 42, "temperature": 0}
+            cache: Response cache, only consulted when options make generation deterministic
+            keep_alive: How long Ollama keeps the model loaded after a request
+            probe_interval: Seconds between health probes of a failed host
+            prefix_cache: Send static system prompts as the system message, so Ollama's prompt
+                cache reuses their evaluation across requests
+            vocabulary_path: JSON file of style and mood terms, defaults to the bundled vocabulary
+            fallback_models: Cheaper models, fastest last, to drop to when the model is overloaded
+            max_queue_depth: In-flight requests per model before dropping to the next tier
+            p95_threshold: p95 latency in seconds before dropping to the next tier
+            embedding_model: Model used by embed() for semantic memory retrieval
         """
-        self.host = host
+        hosts = [host] if isinstance(host, str) else list(host)
+        self.host = hosts[0]
         self.model = model
-        self.api_endpoint = f"{host}/api/generate"
+        self.embedding_model = embedding_model
+        self.api_endpoint = f"{self.host}/api/generate"
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = get_shared_session(pool_size, max_retries)
+        self.hosts = get_host_pool(hosts, self.session, probe_interval=probe_interval, probe_timeout=connect_timeout)
+        self.stream = stream
+        self.stream_token_budget = stream_token_budget
+        self.options = options
+        self.cache = cache
+        self.keep_alive = keep_alive
+        self.prefix_cache = prefix_cache
+        self.vocabulary = get_matcher(vocabulary_path)
+        self.tiers = get_policy([model] + list(fallback_models or []),
+                                max_queue_depth=max_queue_depth,
+                                p95_threshold=p95_threshold)
+        self.ready = threading.Event()
+        self._keep_alive_stop = threading.Event()
+        self._keep_alive_thread: Optional[threading.Thread] = None
+        
+    @contextmanager
+    def _request(self, 
+                 payload: Dict[str, Any], 
+                 stream: bool = False, 
+                 path: str = "/api/generate") -> Iterator[requests.Response]:
+        """
+        Send a request, by default a generation, to the least busy healthy host.
+        
+        Hosts that cannot be reached or answer with a server error are marked
+        unhealthy and the request fails over to the next host. The host counts the request as in flight until the
+        context exits, so streamed responses are tracked until fully consumed.
+        
+        Args:
+            payload: JSON body for the endpoint
+            stream: Whether to read the response body incrementally
+            path: API endpoint to post to
+            
+        Yields:
+            requests.Response: The HTTP response from Ollama
+        """
+        tried = []
+        while True:
+            host = self.hosts.acquire(exclude=tried)
+            if host is None:
+                raise requests.ConnectionError("No Ollama host could be reached")
+            tried.append(host)
+            
+            start = time.monotonic()
+            try:
+                response = self.session.post(f"{host.url}{path}", json=payload,
+                                             timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                logging.error(f"Error connecting to Ollama host {host.url}: {str(e)}")
+                self.hosts.release(host, error=True)
+                continue
+                
+            if response.status_code >= 500 and len(tried) < len(self.hosts.hosts):
+                logging.error(f"Error from Ollama host {host.url}: {response.status_code}, trying another host")
+                response.close()
+                self.hosts.release(host, error=True)
+                continue
+            break
+            
+        error = response.status_code >= 500
+        try:
+            yield response
+        except Exception:
+            error = True
+            raise
+        finally:
+            response.close()
+            self.hosts.release(host, latency=time.monotonic() - start, error=error)
+            
+    def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Get an embedding vector for a text from the embedding model.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            The embedding vector, or None if it could not be computed
+        """
+        payload = {"model": self.embedding_model, "prompt": text, "keep_alive": self.keep_alive}
+        try:
+            with self._request(payload, path="/api/embeddings") as response:
+                if response.status_code != 200:
+                    logging.error(f"Error from Ollama embeddings API: {response.status_code} - {response.text}")
+                    return None
+                return response.json().get("embedding") or None
+        except Exception as e:
+            logging.error(f"Error getting embedding: {str(e)}")
+            return None
+            
+    def host_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-host request counts, health and latency statistics.
+        
+        Returns:
+            Dict mapping host URLs to their statistics
+        """
+        return self.hosts.stats()
+        
+    @property
+    def deterministic(self) -> bool:
+        """Whether the generation options make responses reproducible and thus cacheable."""
+        options = self.options or {}
+        return options.get("temperature") == 0 or options.get("seed") is not None
+        
+    def _cache_key(self, prompt: str, model: str) -> Optional[str]:
+        """Get the response cache key for a prompt, or None if caching does not apply."""
+        if self.cache is None or not self.deterministic:
+            return None
+        return ResponseCache.make_key(model, prompt, self.options)
+        
+    def _request_data(self, prefix: str, suffix: str, model: str, stream: bool = False) -> Dict[str, Any]:
+        """
+        Build the JSON body for a generate request.
+        
+        With prefix caching the static prefix is sent as the system message.
+        Ollama's template puts it first, so every request starts with the same
+        tokens and the server reuses their evaluation from its prompt cache.
+        """
+        prompt_data = {
+            "model": model,
+            "prompt": prefix + suffix,
+            "stream": stream,
+            "keep_alive": self.keep_alive
+        }
+        if self.prefix_cache:
+            prompt_data["system"] = prefix.strip()
+            prompt_data["prompt"] = suffix
+        if self.options:
+            prompt_data["options"] = self.options
+        return prompt_data
+        
+    def _generate(self, prefix: str, suffix: str) -> Optional[Dict[str, Any]]:
+        """
+        Run a non-streaming generation and clean the output, using the response cache if enabled.
+        
+        The model is chosen per request by the tier policy.
+        
+        Args:
+            prefix: The static system-prompt portion of the prompt
+            suffix: The per-request portion of the prompt
+            
+        Returns:
+            Dict with the cleaned response "text" and the "model" used, or None if the request failed
+        """
+        model = self.tiers.acquire()
+        latency = None
+        try:
+            cache_key = self._cache_key(prefix + suffix, model)
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logging.info("Using cached LLM response")
+                    return {"text": cached, "model": model, "stats": {"cached": True}}
+                    
+            if model != self.model:
+                logging.warning(f"Model {self.model} is overloaded, using {model}")
+                
+            start = time.monotonic()
+            with self._request(self._request_data(prefix, suffix, model)) as response:
+                if response.status_code != 200:
+                    logging.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+                    return None
+                result = response.json()
+            latency = time.monotonic() - start
+        finally:
+            self.tiers.release(model, latency)
+            
+        # Clean up any thinking text or tags
+        text = self._clean_llm_output(result.get("response", "").strip())
+        
+        if cache_key and text:
+            self.cache.put(cache_key, text)
+        return {"text": text, "model": model, "stats": self._record_stats(result)}
+        
+    def _record_stats(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract Ollama's token and timing fields and add them to the process metrics.
+        
+        Args:
+            result: A finished generate response (or final stream chunk)
+            
+        Returns:
+            Dict with the token counts, durations in seconds and generation speed
+        """
+        stats = {field: result[field] for field in GENERATION_STAT_FIELDS if field in result}
+        for field in GENERATION_STAT_FIELDS:
+            if field.endswith("_duration") and field in stats:
+                stats[field] = stats[field] / 1e9
+                
+        if stats.get("eval_count") and stats.get("eval_duration"):
+            stats["tokens_per_second"] = stats["eval_count"] / stats["eval_duration"]
+            metrics.observe("llm.tokens_per_second", stats["tokens_per_second"])
+        if stats.get("prompt_eval_count") and stats.get("prompt_eval_duration"):
+            metrics.observe("llm.prompt_tokens_per_second", stats["prompt_eval_count"] / stats["prompt_eval_duration"])
+            
+        metrics.increment("llm.generations")
+        metrics.increment("llm.prompt_tokens", stats.get("prompt_eval_count", 0))
+        metrics.increment("llm.generated_tokens", stats.get("eval_count", 0))
+        if "load_duration" in stats:
+            metrics.observe("llm.load_seconds", stats["load_duration"])
+            if stats["load_duration"] >= COLD_LOAD_SECONDS:
+                metrics.increment("llm.model_loads")
+        return stats
+        
+    def warm_up(self) -> bool:
+        """
+        Load the model into memory and pin it for the keep-alive duration.
+        
+        An empty generate request makes Ollama load the model without generating,
+        so the first real request does not pay for the model load.
+        
+        Returns:
+            bool: True if the model is loaded and ready on at least one host
+        """
+        loaded = False
+        for host in self.hosts.hosts:
+            for model in self.tiers.models:
+                try:
+                    response = self.session.post(f"{host.url}/api/generate",
+                                                 json={"model": model, "keep_alive": self.keep_alive},
+                                                 timeout=self.timeout)
+                    if response.status_code == 200:
+                        # Readiness depends on the preferred model only
+                        loaded = loaded or model == self.model
+                        continue
+                    logging.error(f"Error warming up {model} on {host.url}: {response.status_code} - {response.text}")
+                except Exception as e:
+                    logging.error(f"Error warming up {model} on {host.url}: {str(e)}")
+                
+        if loaded:
+            if not self.ready.is_set():
+                logging.info(f"Ollama model {self.model} is loaded")
+            self.ready.set()
+        else:
+            self.ready.clear()
+        return loaded
+        
+    def start_keep_alive(self, interval: float = 300.0) -> None:
+        """
+        Warm up the model in a background thread and refresh it periodically.
+        
+        Args:
+            interval: Seconds between refreshes; should be shorter than keep_alive
+        """
+        if self._keep_alive_thread and self._keep_alive_thread.is_alive():
+            return
+            
+        def refresh():
+            while not self._keep_alive_stop.is_set():
+                self.warm_up()
+                # Retry sooner while the model is not loaded yet
+                self._keep_alive_stop.wait(interval if self.ready.is_set() else min(interval, 10.0))
+                
+        self._keep_alive_stop.clear()
+        self._keep_alive_thread = threading.Thread(target=refresh, name="ollama-keep-alive", daemon=True)
+        self._keep_alive_thread.start()
+        
+    def stop_keep_alive(self) -> None:
+        """Stop the background keep-alive refresh."""
+        self._keep_alive_stop.set()
+        
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the model has been loaded.
+        
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+            
+        Returns:
+            bool: True if the model is ready
+        """
+        return self.ready.wait(timeout)
         
     def enhance_prompt(self, prompt: str) -> str:
         """
@@ -34,36 +469,17 @@ class OllamaClient:
         Returns:
             str: Enhanced, detailed prompt suitable for image generation
         """
-        system_prompt = """You are an expert at creating detailed, vivid descriptions for image generation.
-Take the user's basic prompt and enhance it with specific details about:
-- Lighting, colors, and atmosphere
-- Detailed visual elements
-- Style, mood, and artistic direction
-Your output should ONLY be the enhanced prompt text, with no explanations or additional text."""
-
         try:
-            prompt_data = {
-                "model": self.model,
-                "prompt": f"{system_prompt}\n\nUser prompt: {prompt}\n\nEnhanced prompt:",
-                "stream": False
-            }
-            
             logging.info(f"Sending prompt to Ollama: {prompt}")
-            response = requests.post(self.api_endpoint, json=prompt_data)
+            generation = self._generate(ENHANCE_SYSTEM_PROMPT, f"\n\nUser prompt: {prompt}\n\nEnhanced prompt:")
             
-            if response.status_code == 200:
-                result = response.json()
-                enhanced_prompt = result.get("response", "").strip()
-                
-                # Clean up any thinking text or tags
-                enhanced_prompt = self._clean_llm_output(enhanced_prompt)
-                
-                logging.info(f"Enhanced prompt: {enhanced_prompt}")
-                return enhanced_prompt
-            else:
-                logging.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+            if generation is None:
                 return prompt  # Return original prompt on error
                 
+            enhanced_prompt = generation["text"]
+            logging.info(f"Enhanced prompt: {enhanced_prompt}")
+            return enhanced_prompt
+                
         except Exception as e:
             logging.error(f"Error enhancing prompt: {str(e)}")
             return prompt  # Return original prompt on error
@@ -77,64 +493,197 @@ Your output should ONLY be the enhanced prompt text, with no explanations or add
             memory_context: Optional context from previous interactions
             
         Returns:
-            Dict with enhanced prompt and additional metadata
+            Dict with enhanced prompt and additional metadata, including the model used
         """
-        context_text = ""
-        if memory_context:
-            context_text = f"Consider this context from previous creations: {memory_context}\n\n"
+        user_text = self._build_creative_prompt(user_prompt, memory_context)
+        
+        if self.stream:
+            generation = {}
+            enhanced_prompt = "".join(self._stream(CREATIVE_SYSTEM_PROMPT, user_text, generation))
+            if not enhanced_prompt:
+                return self._fallback_response(user_prompt)
+            return {**self._describe(enhanced_prompt),
+                    "model": generation.get("model"),
+                    "llm_stats": generation.get("stats", {})}
             
-        # Use a simpler approach that doesn't require JSON output
-        system_prompt = f"""You are a creative AI assisting with generating detailed descriptions for visual content.
-{context_text}The user wants to create: {user_prompt}
-
-Please enhance this prompt with specific details about:
-1. Visual details (colors, lighting, composition)
-2. Style references
-3. Mood and atmosphere
-
-Your output should be ONLY the enhanced, detailed description with no explanations or additional text.
-"""
-
         try:
-            prompt_data = {
-                "model": self.model,
-                "prompt": system_prompt,
-                "stream": False
-            }
+            generation = self._generate(CREATIVE_SYSTEM_PROMPT, user_text)
             
-            response = requests.post(self.api_endpoint, json=prompt_data)
+            if generation is None:
+                return self._fallback_response(user_prompt)
+                
+            return {**self._describe(generation["text"]),
+                    "model": generation["model"],
+                    "llm_stats": generation["stats"]}
+                
+        except Exception as e:
+            logging.error(f"Error generating creative prompt: {str(e)}")
+            return self._fallback_response(user_prompt)
             
-            if response.status_code == 200:
-                result = response.json()
-                response_text = result.get("response", "").strip()
+    def stream_creative_prompt(self, user_prompt: str, memory_context: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream a creative prompt, yielding cleaned text as soon as it is generated.
+        
+        Thinking sections and tags are stripped while tokens arrive. Generation
+        runs until the model finishes, or is stopped by closing the connection to
+        Ollama once the token budget is exhausted.
+        
+        Args:
+            user_prompt: The original prompt from the user
+            memory_context: Optional context from previous interactions
+            
+        Yields:
+            str: Fragments of the cleaned, enhanced prompt
+        """
+        yield from self._stream(CREATIVE_SYSTEM_PROMPT, self._build_creative_prompt(user_prompt, memory_context), {})
+        
+    def _stream(self, prefix: str, suffix: str, generation: Dict[str, Any]) -> Iterator[str]:
+        """
+        Run a streaming generation, yielding cleaned fragments.
+        
+        Args:
+            prefix: The static system-prompt portion of the prompt
+            suffix: The per-request portion of the prompt
+            generation: Filled with the "model" used once the request starts and
+                the token and timing "stats" once it ends
+            
+        Yields:
+            str: Fragments of the cleaned response
+        """
+        model = self.tiers.acquire()
+        generation["model"] = model
+        latency = None
+        try:
+            cache_key = self._cache_key(prefix + suffix, model)
+            if cache_key:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logging.info("Using cached LLM response")
+                    generation["stats"] = {"cached": True}
+                    yield cached
+                    return
+                    
+            if model != self.model:
+                logging.warning(f"Model {self.model} is overloaded, using {model}")
                 
-                # Clean up the response
-                enhanced_prompt = self._clean_llm_output(response_text)
+            cleaner = StreamCleaner()
+            emitted = []
+            tokens = 0
+            start = time.monotonic()
+            
+            # Leaving the request closes the connection, which makes Ollama abort the generation
+            request_data = self._request_data(prefix, suffix, model, stream=True)
+            with self._request(request_data, stream=True) as response:
+                if response.status_code != 200:
+                    logging.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+                    return
+                    
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    text = cleaner.feed(chunk.get("response", ""))
+                    if text:
+                        emitted.append(text)
+                        yield text
+                        
+                    tokens += 1
+                    if chunk.get("done"):
+                        generation["stats"] = self._record_stats(chunk)
+                        break
+                    if tokens >= self.stream_token_budget:
+                        logging.warning(f"Stopping generation after token budget of {self.stream_token_budget}")
+                        break
+            latency = time.monotonic() - start
+                        
+            if "stats" not in generation:
+                # Ollama only reports timings for finished generations
+                generation["stats"] = {"eval_count": tokens, "stopped_early": True}
+                metrics.increment("llm.generations")
+                metrics.increment("llm.generated_tokens", tokens)
                 
-                # Extract style and mood manually
-                style_tags = self._extract_style_tags(enhanced_prompt)
-                mood = self._extract_mood(enhanced_prompt)
+            text = cleaner.finish()
+            if text:
+                emitted.append(text)
+                yield text
                 
-                return {
-                    "enhanced_prompt": enhanced_prompt,
-                    "style_tags": style_tags,
-                    "mood": mood
-                }
-            else:
-                logging.error(f"Error from Ollama API: {response.status_code} - {response.text}")
-                return {
-                    "enhanced_prompt": user_prompt,
-                    "style_tags": [],
-                    "mood": "unknown"
-                }
+            # A response cut off by the token budget is not the model's full answer
+            if cache_key and emitted and not generation["stats"].get("stopped_early"):
+                self.cache.put(cache_key, "".join(emitted))
                 
         except Exception as e:
-            logging.error(f"Error generating creative prompt: {str(e)}")
-            return {
-                "enhanced_prompt": user_prompt,
-                "style_tags": [],
-                "mood": "unknown"
-            }
+            logging.error(f"Error streaming creative prompt: {str(e)}")
+        finally:
+            self.tiers.release(model, latency)
+            
+    def score_prompt(self, prompt: str) -> float:
+        """
+        Estimate how detailed a prompt already is, without calling the LLM.
+        
+        Args:
+            prompt: The original user prompt
+            
+        Returns:
+            float: Detail score between 0 (bare) and 1 (already detailed)
+        """
+        return score_prompt(prompt, self.vocabulary)
+        
+    def describe_locally(self, prompt: str) -> Dict[str, Any]:
+        """
+        Build a creative prompt response from the prompt as-is, skipping the LLM.
+        
+        Args:
+            prompt: A prompt detailed enough to be used without enhancement
+            
+        Returns:
+            Dict in the format of generate_creative_prompt, with locally extracted tags
+        """
+        return {**self._describe(prompt), "model": None, "llm_stats": {}}
+        
+    def _build_creative_prompt(self, user_prompt: str, memory_context: Optional[str] = None) -> str:
+        """Build the per-request part of the prompt that follows CREATIVE_SYSTEM_PROMPT."""
+        context_text = ""
+        if memory_context:
+            context_text = f"Consider this context from previous creations: {memory_context}\n\n"
+            
+        # Use a simpler approach that doesn't require JSON output
+        return f"""
+{context_text}The user wants to create: {user_prompt}
+"""
+    
+    def _describe(self, enhanced_prompt: str) -> Dict[str, Any]:
+        """Build the creative prompt response, extracting style and mood manually."""
+        return {"enhanced_prompt": enhanced_prompt, **self.extract_tags(enhanced_prompt)}
+        
+    def extract_tags(self, text: str) -> Dict[str, Any]:
+        """
+        Extract style tags and mood from a text in a single scan.
+        
+        Args:
+            text: Text to analyze
+            
+        Returns:
+            Dict with style_tags, mood and the per-term style_counts and mood_counts
+        """
+        found = self.vocabulary.scan(text)
+        styles = found.get("styles", {})
+        moods = found.get("moods", {})
+        return {
+            "style_tags": list(styles),
+            "mood": self._pick_mood(moods),
+            "style_counts": styles,
+            "mood_counts": moods
+        }
+        
+    def _fallback_response(self, user_prompt: str) -> Dict[str, Any]:
+        """Response used when the LLM could not enhance the prompt."""
+        return {
+            "enhanced_prompt": user_prompt,
+            "style_tags": [],
+            "mood": "unknown",
+            "model": None,
+            "llm_stats": {}
+        }
     
     def _clean_llm_output(self, text: str) -> str:
         """
@@ -158,36 +707,10 @@ Your output should be ONLY the enhanced, detailed description with no explanatio
         text = '\n'.join(filtered_lines)
         
         return text.strip()
-    
-    def _extract_style_tags(self, text: str) -> list:
-        """Extract potential style tags from the text"""
-        # List of common art styles and descriptors
-        styles = [
-            "realistic", "abstract", "impressionist", "surreal", "minimalist", 
-            "cartoon", "anime", "fantasy", "sci-fi", "vintage", "modern", 
-            "cyberpunk", "steampunk", "gothic", "noir", "watercolor", "oil painting",
-            "sketch", "digital art", "pop art", "conceptual", "futuristic"
-        ]
-        
-        found_styles = []
-        for style in styles:
-            if style in text.lower():
-                found_styles.append(style)
-                
-        return found_styles
-    
-    def _extract_mood(self, text: str) -> str:
-        """Extract potential mood from the text"""
-        # List of common moods
-        moods = [
-            "happy", "sad", "mysterious", "dark", "light", "joyful", "melancholic",
-            "serene", "chaotic", "peaceful", "tense", "nostalgic", "dreamy",
-            "nightmare", "fantasy", "romantic", "scary", "horror", "whimsical",
-            "dramatic", "epic", "tranquil", "energetic", "calm", "angry"
-        ]
-        
-        for mood in moods:
-            if mood in text.lower():
-                return mood
-                
-        return "unknown" 
\ No newline at end of file
+        
+    @staticmethod
+    def _pick_mood(mood_counts: Dict[str, int]) -> str:
+        """Pick the most frequent mood, preferring earlier vocabulary entries on ties."""
+        if not mood_counts:
+            return "unknown"
+        return max(mood_counts, key=mood_counts.get)
@@ -0,0 +1,45 @@
+import re
+
+from core.llm.vocabulary import VocabularyMatcher
+
+_WORD_RE = re.compile(r"[a-zA-Z][a-zA-Z'-]*")
+
+# Suffixes typical of adjectives and participles used as visual descriptors
+_DESCRIPTOR_SUFFIXES = ("ful", "ous", "ive", "ic", "al", "ed", "ing", "ish", "less", "ent", "ant", "y")
+
+
+def score_prompt(prompt: str,
+                 matcher: VocabularyMatcher,
+                 target_words: int = 60,
+                 target_density: float = 0.3,
+                 target_vocabulary_hits: int = 3) -> float:
+    """
+    Estimate how detailed a prompt already is.
+
+    Combines length, the share of descriptive words and clauses, and the number of
+    style and mood vocabulary hits. Each part is normalized against its target and
+    capped at 1, so the score ranges from 0 (bare) to 1 (already detailed).
+
+    Args:
+        prompt: The user prompt
+        matcher: Vocabulary matcher for styles and moods
+        target_words: Word count considered fully detailed
+        target_density: Descriptor density considered fully detailed
+        target_vocabulary_hits: Style and mood hits considered fully detailed
+
+    Returns:
+        float: The detail score between 0 and 1
+    """
+    words = _WORD_RE.findall(prompt.lower())
+    if not words:
+        return 0.0
+
+    descriptors = sum(1 for word in words if len(word) > 3 and word.endswith(_DESCRIPTOR_SUFFIXES))
+    density = (descriptors + prompt.count(",")) / len(words)
+    found = matcher.scan(prompt)
+    hits = sum(sum(counts.values()) for counts in found.values())
+
+    length_score = min(len(words) / target_words, 1.0)
+    density_score = min(density / target_density, 1.0)
+    vocabulary_score = min(hits / target_vocabulary_hits, 1.0)
+    return 0.4 * length_score + 0.3 * density_score + 0.3 * vocabulary_score
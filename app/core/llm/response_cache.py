@@ -0,0 +1,186 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from core.memory.connection_pool import get_pool
+from core.utils.lru_cache import LRUCache
+
+SELECT_RESPONSE_SQL = 'SELECT response FROM llm_responses WHERE cache_key = ? AND created_at >= ?'
+UPSERT_RESPONSE_SQL = 'INSERT OR REPLACE INTO llm_responses (cache_key, response, created_at) VALUES (?, ?, ?)'
+PURGE_RESPONSES_SQL = 'DELETE FROM llm_responses WHERE created_at < ?'
+
+_caches: Dict[str, "ResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    An in-process LRU sits in front of a persistent table in the memory database,
+    so repeated prompts skip the LLM call both within a process and across restarts.
+    Entries expire after a time-to-live in both tiers; expired rows are deleted
+    from the table every purge_interval writes.
+    """
+
+    def __init__(self,
+                 db_path: str = "datastore/memory.db",
+                 max_entries: int = 256,
+                 ttl: float = 7 * 24 * 3600,
+                 purge_interval: int = 1000):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_path: Path to the SQLite database holding the persistent tier
+            max_entries: Maximum number of responses kept in memory
+            ttl: Seconds a cached response stays valid
+            purge_interval: Number of writes between deletions of expired rows
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.memory = LRUCache(max_size=max_entries, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.pool = get_pool(db_path)
+        self._init_db()
+
+    def _init_db(self):
+        """Create the cache table and its expiry index if needed."""
+        try:
+            conn = self.pool.connection()
+            with conn:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_responses_created ON llm_responses(created_at)')
+        except Exception as e:
+            logging.error(f"Error initializing LLM response cache: {str(e)}")
+
+    def close(self) -> None:
+        """Release the database connection pool, closing it if nothing else uses it."""
+        self.pool.release()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build a cache key from everything that determines the response.
+
+        Args:
+            model: Model identifier
+            prompt: Full prompt sent to the model, including the system prompt
+            options: Generation options such as seed and temperature
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, checking memory first and then the database.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            The cached response text, or None on a miss
+        """
+        response = self.memory.get(key)
+        if response is not None:
+            with self._lock:
+                self.hits += 1
+            return response
+
+        try:
+            row = self.pool.connection().execute(SELECT_RESPONSE_SQL, (key, time.time() - self.ttl)).fetchone()
+        except Exception as e:
+            logging.error(f"Error reading LLM response cache: {str(e)}")
+            row = None
+
+        if row:
+            with self._lock:
+                self.hits += 1
+            self.memory.put(key, row[0])
+            return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Key from make_key
+            response: Response text to cache
+        """
+        self.memory.put(key, response)
+        with self._lock:
+            purge = self._writes % self.purge_interval == 0
+            self._writes += 1
+        try:
+            conn = self.pool.connection()
+            now = time.time()
+            with conn:
+                conn.execute(UPSERT_RESPONSE_SQL, (key, response, now))
+                if purge:
+                    conn.execute(PURGE_RESPONSES_SQL, (now - self.ttl,))
+        except Exception as e:
+            logging.error(f"Error writing LLM response cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict with overall hit/miss counts and the in-memory tier statistics
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats()
+        }
+
+
+def get_response_cache(db_path: str = "datastore/memory.db", **kwargs) -> ResponseCache:
+    """
+    Get the response cache shared by all clients of a database file.
+
+    Pipelines are created per request, so sharing the cache keeps its in-memory
+    tier and hit counts across requests. A cache whose pool was closed or whose
+    file was deleted is replaced, as get_pool does for pools.
+
+    Args:
+        db_path: Path to the SQLite database holding the persistent tier
+        **kwargs: ResponseCache settings, used when the cache is created
+
+    Returns:
+        ResponseCache: The cache for that file
+    """
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is not None and (cache.pool.closed or not os.path.exists(db_path)):
+            cache = None
+        if cache is None:
+            cache = ResponseCache(db_path=db_path, **kwargs)
+            _caches[key] = cache
+        return cache
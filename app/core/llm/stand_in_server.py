@@ -0,0 +1,285 @@
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_RESPONSE = ("A majestic dragon perched on a jagged mountain peak at sunset, its crimson scales "
+                    "glowing in warm golden light, dramatic clouds swirling behind it, epic fantasy "
+                    "oil painting with rich, saturated colors and a mysterious atmosphere.")
+
+DEFAULT_THINKING = "The user wants a vivid scene. I should describe lighting, colors, style and mood."
+
+
+class OllamaStandIn:
+    """
+    Lightweight local HTTP server that imitates the parts of the Ollama API we use.
+
+    Implements /api/generate (streaming and non-streaming), /api/embeddings and
+    /api/tags with configurable per-token latency, <think> block emission and
+    error injection, so the LLM client, streaming parser and caching layers can
+    be tested and benchmarked without a GPU or a real model.
+
+    Like Ollama, a model only evaluates the part of a prompt that differs from
+    the one before it, and raw requests neither return nor accept a context.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 models: Optional[List[str]] = None,
+                 response_text: str = DEFAULT_RESPONSE,
+                 thinking_text: Optional[str] = DEFAULT_THINKING,
+                 token_latency: float = 0.0,
+                 load_latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 embedding_dim: int = 64,
+                 seed: Optional[int] = None):
+        """
+        Initialize the stand-in server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on, 0 for any free port
+            models: Model names reported by /api/tags and accepted by /api/generate
+            response_text: Text generated for every prompt
+            thinking_text: Text emitted inside a <think> block first, or None for no block
+            token_latency: Seconds to wait per generated token
+            load_latency: Seconds to wait the first time each model is used
+            error_rate: Probability (0-1) of answering a request with HTTP 500
+            embedding_dim: Length of the vectors returned by /api/embeddings
+            seed: Seed for error injection, for reproducible runs
+        """
+        self.models = models or ["deepseek-r1:latest"]
+        self.response_text = response_text
+        self.thinking_text = thinking_text
+        self.token_latency = token_latency
+        self.load_latency = load_latency
+        self.error_rate = error_rate
+        self.embedding_dim = embedding_dim
+        self.requests: List[Dict[str, Any]] = []
+        self._loaded = set()
+        self._prompts: Dict[str, List[str]] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to OllamaClient as its host."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "OllamaStandIn":
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="ollama-stand-in", daemon=True)
+        self._thread.start()
+        logging.info(f"Ollama stand-in listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "OllamaStandIn":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def tokens(self) -> List[str]:
+        """Get the tokens emitted for a generation, including the thinking block."""
+        text = self.response_text
+        if self.thinking_text is not None:
+            text = f"<think>\n{self.thinking_text}\n</think>\n\n{text}"
+        # Split into word-sized tokens that keep their leading whitespace
+        tokens, current = [], ""
+        for char in text:
+            if char.isspace() and current.strip():
+                tokens.append(current)
+                current = ""
+            current += char
+        if current:
+            tokens.append(current)
+        return tokens
+
+    def embedding(self, text: str) -> List[float]:
+        """
+        Get a deterministic embedding for a text.
+
+        Words are hashed into buckets, so texts sharing words get similar vectors.
+        """
+        vector = [0.0] * self.embedding_dim
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,;:!?'\"").encode("utf-8")).digest()
+            vector[digest[0] % self.embedding_dim] += 1.0 if digest[1] % 2 else -1.0
+        return vector
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _load(self, model: str) -> float:
+        """Simulate loading a model, returning the load time in seconds."""
+        with self._lock:
+            cold = model not in self._loaded
+            self._loaded.add(model)
+        if cold and self.load_latency:
+            time.sleep(self.load_latency)
+            return self.load_latency
+        return 0.0
+
+    def _evaluate(self, model: str, words: List[str]) -> int:
+        """Simulate the prompt cache of a model, returning the number of words evaluated."""
+        with self._lock:
+            previous = self._prompts.get(model, [])
+            self._prompts[model] = words
+        cached = 0
+        while cached < min(len(previous), len(words)) and previous[cached] == words[cached]:
+            cached += 1
+        return len(words) - cached
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logging.debug(f"Ollama stand-in: {format % args}")
+
+            def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting, e.g. after a read timeout
+                    self.close_connection = True
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": model, "model": model} for model in stand_in.models]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with stand_in._lock:
+                    stand_in.requests.append({"path": self.path, **body})
+
+                if stand_in._should_fail():
+                    self._send_json(500, {"error": "injected failure"})
+                elif self.path == "/api/generate":
+                    self._generate(body)
+                elif self.path == "/api/embeddings":
+                    self._send_json(200, {"embedding": stand_in.embedding(body.get("prompt", ""))})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def _generate(self, body: Dict[str, Any]) -> None:
+                model = body.get("model")
+                if model not in stand_in.models:
+                    self._send_json(404, {"error": f"model '{model}' not found"})
+                    return
+
+                start = time.monotonic()
+                load_duration = stand_in._load(model)
+                prompt = body.get("prompt", "")
+                if not prompt:
+                    # An empty prompt only loads the model
+                    self._send_json(200, {"model": model, "response": "", "done": True,
+                                          "load_duration": int(load_duration * 1e9)})
+                    return
+
+                tokens = stand_in.tokens()
+                num_predict = (body.get("options") or {}).get("num_predict")
+                if num_predict is not None and num_predict >= 0:
+                    tokens = tokens[:num_predict]
+                raw = body.get("raw", False)
+                # The template puts the system message first; raw prompts are used as they are
+                words = (prompt if raw else f"{body.get('system') or ''}\n\n{prompt}").split()
+                stats = {
+                    "prompt_eval_count": stand_in._evaluate(model, words),
+                    "prompt_eval_duration": 1_000_000,
+                    "eval_count": len(tokens),
+                    "load_duration": int(load_duration * 1e9)
+                }
+                # Ollama neither returns a context for raw prompts nor continues one
+                context = {} if raw else {
+                    "context": list(body.get("context") or []) + list(range(len(words) + len(tokens)))
+                }
+
+                if not body.get("stream", True):
+                    time.sleep(stand_in.token_latency * len(tokens))
+                    self._send_json(200, {
+                        "model": model, "response": "".join(tokens), "done": True,
+                        "eval_duration": int(stand_in.token_latency * len(tokens) * 1e9) or 1,
+                        "total_duration": int((time.monotonic() - start) * 1e9), **stats, **context
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        time.sleep(stand_in.token_latency)
+                        self._write_chunk({"model": model, "response": token, "done": False})
+                    self._write_chunk({
+                        "model": model, "response": "", "done": True,
+                        "eval_duration": int(stand_in.token_latency * len(tokens) * 1e9) or 1,
+                        "total_duration": int((time.monotonic() - start) * 1e9), **stats, **context
+                    })
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading early
+                    self.close_connection = True
+
+            def _write_chunk(self, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    """Run the stand-in from the command line."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", dest="models", help="Model name to serve (repeatable)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds to load each model once")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 500 response")
+    parser.add_argument("--no-think", action="store_true", help="Do not emit a <think> block")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stand_in = OllamaStandIn(host=args.host, port=args.port, models=args.models,
+                             thinking_text=None if args.no_think else DEFAULT_THINKING,
+                             token_latency=args.token_latency, load_latency=args.load_latency,
+                             error_rate=args.error_rate)
+    logging.info(f"Ollama stand-in listening on {stand_in.url}")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        stand_in.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
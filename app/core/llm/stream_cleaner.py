@@ -0,0 +1,160 @@
+from typing import List
+
+
+class StreamCleaner:
+    """
+    Incremental counterpart of OllamaClient._clean_llm_output for streamed responses.
+
+    Text is fed in arbitrary chunks as tokens arrive. A small state machine drops
+    <think>...</think> sections, XML-like tags and "Enhanced prompt:" lines, and
+    returns the cleaned text as soon as it is known to be part of the final output.
+    """
+
+    TEXT = "text"
+    TAG = "tag"
+    THINK = "think"
+
+    THINK_OPEN = "think"
+    THINK_CLOSE = "</think>"
+    LINE_PREFIX = "enhanced prompt:"
+
+    def __init__(self, stop_at_paragraph: bool = False, min_chars: int = 40):
+        """
+        Initialize the stream cleaner.
+
+        Args:
+            stop_at_paragraph: Treat a blank line after the prompt text as the end of the prompt.
+                Off by default, since models also use blank lines to format a single answer
+            min_chars: Minimum emitted characters before a blank line can end the prompt
+        """
+        self.stop_at_paragraph = stop_at_paragraph
+        self.min_chars = min_chars
+
+        self.state = self.TEXT
+        self.done = False
+        self.emitted_chars = 0
+
+        self._tag = ""          # Characters of a tag being read, without the '<'
+        self._think_tail = ""   # Trailing characters inside a thinking section
+        self._line = ""         # Start of the current line while the prefix is undecided
+        self._line_state = None # None (undecided), "keep" or "drop"
+        self._pending_ws = ""   # Whitespace held back until more text arrives
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk of raw model output.
+
+        Args:
+            chunk: The next piece of streamed text
+
+        Returns:
+            str: Cleaned text that can be emitted now (may be empty)
+        """
+        out: List[str] = []
+        for char in chunk:
+            if self.done:
+                break
+            self._consume(char, out)
+        return "".join(out)
+
+    def finish(self) -> str:
+        """
+        Flush any text held back at the end of the stream.
+
+        Returns:
+            str: Remaining cleaned text (trailing whitespace is dropped)
+        """
+        out: List[str] = []
+        if not self.done:
+            if self.state == self.TAG:
+                # An unterminated tag is kept as literal text
+                self._emit_line_char("<", out)
+                for char in self._tag:
+                    self._emit_line_char(char, out)
+            self._flush_line(out)
+        self.state = self.TEXT
+        self._tag = ""
+        self._think_tail = ""
+        self._pending_ws = ""
+        return "".join(out)
+
+    def _consume(self, char: str, out: List[str]) -> None:
+        """Advance the tag/think state machine by one character."""
+        if self.state == self.THINK:
+            self._think_tail = (self._think_tail + char)[-len(self.THINK_CLOSE):]
+            if self._think_tail == self.THINK_CLOSE:
+                self.state = self.TEXT
+                self._think_tail = ""
+            return
+
+        if self.state == self.TAG:
+            if char == ">":
+                self.state = self.THINK if self._tag == self.THINK_OPEN else self.TEXT
+                self._tag = ""
+            elif char == "\n":
+                # Tags never span lines, so the '<' was literal text
+                self.state = self.TEXT
+                self._emit_line_char("<", out)
+                for tag_char in self._tag:
+                    self._emit_line_char(tag_char, out)
+                self._tag = ""
+                self._emit_line_char(char, out)
+            else:
+                self._tag += char
+            return
+
+        if char == "<":
+            self.state = self.TAG
+            return
+        self._emit_line_char(char, out)
+
+    def _emit_line_char(self, char: str, out: List[str]) -> None:
+        """Filter out lines starting with the "Enhanced prompt:" label."""
+        if char == "\n":
+            if self._line_state != "drop":
+                self._flush_line(out)
+                self._emit(char, out)
+            self._line = ""
+            self._line_state = None
+            return
+
+        if self._line_state == "drop":
+            return
+        if self._line_state == "keep":
+            self._emit(char, out)
+            return
+
+        self._line += char
+        lowered = self._line.lower()
+        if lowered.startswith(self.LINE_PREFIX):
+            self._line_state = "drop"
+            self._line = ""
+        elif not self.LINE_PREFIX.startswith(lowered):
+            self._flush_line(out)
+            self._line_state = "keep"
+
+    def _flush_line(self, out: List[str]) -> None:
+        """Emit the buffered start of the current line."""
+        line, self._line = self._line, ""
+        for char in line:
+            self._emit(char, out)
+
+    def _emit(self, char: str, out: List[str]) -> None:
+        """Trim surrounding whitespace and detect the end of the prompt."""
+        if self.done:
+            return
+        if char.isspace():
+            if self.emitted_chars:
+                self._pending_ws += char
+            return
+
+        if self.stop_at_paragraph and self.emitted_chars >= self.min_chars \
+                and self._pending_ws.count("\n") >= 2:
+            self.done = True
+            self._pending_ws = ""
+            return
+
+        out.append(self._pending_ws)
+        out.append(char)
+        self.emitted_chars += len(self._pending_ws) + 1
+        self._pending_ws = ""
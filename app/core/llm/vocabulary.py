@@ -0,0 +1,132 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabulary.json")
+
+_matchers: Dict[str, "VocabularyMatcher"] = {}
+_matchers_lock = threading.Lock()
+
+
+def _normalize(term: str) -> str:
+    """Normalize a term for lookup: lowercase with single spaces."""
+    return " ".join(term.lower().split())
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """
+    Build a regex alternation from a trie of terms.
+
+    Shared prefixes are factored out, so matching cost grows with the length
+    of the text rather than with the number of terms.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        ends_here = "" in node
+        branches = []
+        for char in sorted(key for key in node if key):
+            # Any run of whitespace matches the single space in a term
+            atom = r"\s+" if char == " " else re.escape(char)
+            branches.append(atom + build(node[char]))
+
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            # Quantifiers are greedy, so the longest term is tried first
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return build(trie)
+
+
+class VocabularyMatcher:
+    """
+    Single-pass matcher for categorized vocabulary terms such as styles and moods.
+
+    All terms are compiled into one case-insensitive regex with word boundaries,
+    so a text is scanned once regardless of vocabulary size, and "light" does not
+    match inside "lightning".
+    """
+
+    def __init__(self, vocabulary: Dict[str, List[str]]):
+        """
+        Initialize the matcher.
+
+        Args:
+            vocabulary: Mapping of category names (e.g. "styles") to their terms
+        """
+        self.vocabulary = {category: [_normalize(term) for term in terms]
+                           for category, terms in vocabulary.items()}
+
+        # A term can belong to several categories, e.g. "fantasy" is a style and a mood
+        self.categories: Dict[str, List[str]] = {}
+        for category, terms in self.vocabulary.items():
+            for term in terms:
+                self.categories.setdefault(term, []).append(category)
+
+        pattern = _trie_pattern(list(self.categories))
+        self.pattern = re.compile(r"(?<!\w)(?:" + pattern + r")(?!\w)", re.IGNORECASE) if pattern else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "VocabularyMatcher":
+        """
+        Load a matcher from a JSON file mapping categories to lists of terms.
+
+        Args:
+            path: Path to the vocabulary file
+
+        Returns:
+            VocabularyMatcher: The compiled matcher
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def scan(self, text: str) -> Dict[str, Dict[str, int]]:
+        """
+        Find all vocabulary terms in a text.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Dict mapping each category to the terms found and their counts,
+            in vocabulary order
+        """
+        counts: Dict[str, int] = {}
+        if self.pattern is not None:
+            for match in self.pattern.finditer(text):
+                term = _normalize(match.group(0))
+                counts[term] = counts.get(term, 0) + 1
+
+        return {
+            category: {term: counts[term] for term in terms if term in counts}
+            for category, terms in self.vocabulary.items()
+        }
+
+
+def get_matcher(path: Optional[str] = None) -> VocabularyMatcher:
+    """
+    Get the compiled matcher for a vocabulary file, building it once per process.
+
+    Args:
+        path: Path to the vocabulary file, or None for the bundled default
+
+    Returns:
+        VocabularyMatcher: The shared matcher for that file
+    """
+    path = os.path.abspath(path or DEFAULT_VOCABULARY_PATH)
+    with _matchers_lock:
+        matcher = _matchers.get(path)
+        if matcher is None:
+            matcher = VocabularyMatcher.from_file(path)
+            _matchers[path] = matcher
+        return matcher
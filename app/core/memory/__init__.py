@@ -1 +1,2 @@
-from core.memory.memory_manager import MemoryManager 
\ No newline at end of file
+from core.memory.memory_manager import MemoryManager 
+from core.memory.creation import Creation
\ No newline at end of file
@@ -0,0 +1,201 @@
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import IO, Any, Dict, Iterable, List, Tuple, Union
+
+from core.memory.context_builder import summarize_creation
+from core.memory.memory_manager import (ALL_TENANTS, CREATION_COLUMNS, DEFAULT_TENANT, FTS_SCHEMA_SQL, MemoryManager,
+                                        bump_generation, content_hash, epoch_millis, normalize_tags,
+                                        write_creations)
+from core.utils.metrics import metrics
+
+# Dropped for the length of a batch's transaction and recreated with FTS_SCHEMA_SQL before it commits
+FTS_DROP_INSERT_TRIGGER_SQL = 'DROP TRIGGER IF EXISTS creations_fts_insert'
+# Indexes a batch's rows into full text in one statement instead of one trigger call each
+FTS_LOAD_SQL = '''
+INSERT INTO creations_fts(rowid, user_prompt, enhanced_prompt, tags, tenant_id)
+SELECT id, user_prompt, enhanced_prompt, tags, tenant_id FROM creations WHERE id >= ?
+'''
+EXISTING_HASHES_SQL = 'SELECT content_hash FROM creations WHERE content_hash IN ({placeholders})'
+
+# Columns written to exports; IDs are included for reference but reassigned on import
+EXPORT_FIELDS = ("id", "tenant_id", "timestamp", "created_at", "user_prompt", "enhanced_prompt",
+                 "image_path", "model_path", "metadata", "tags", "summary")
+
+# Parameters per duplicate lookup, well below SQLite's limit on host parameters
+_HASH_LOOKUP_SIZE = 500
+# Page cache of the importing connection (KiB), so index pages stay in memory while loading
+_IMPORT_CACHE_KIB = 131072
+# Seconds the import waits between batches. SQLite's busy handler sleeps at most 100 ms
+# between attempts, so a writer waiting for the lock gets it within this pause.
+_WRITER_PAUSE = 0.12
+
+
+def export_ndjson(memory: MemoryManager,
+                  destination: Union[str, IO[str]],
+                  chunk_size: int = 1000) -> int:
+    """
+    Export creations as newline-delimited JSON, oldest first.
+
+    Rows are streamed a page at a time, so memory use stays constant however
+    large the history is. A tenant's manager exports its own creations, a
+    manager opened with ALL_TENANTS exports everyone's.
+
+    Args:
+        memory: Memory to export from
+        destination: File path or text file to write to
+        chunk_size: Number of rows read per query
+
+    Returns:
+        int: Number of creations exported
+    """
+    if isinstance(destination, str):
+        with open(destination, "w", encoding="utf-8") as f:
+            return export_ndjson(memory, f, chunk_size)
+
+    count = 0
+    for creation in memory.iter_creations(chunk_size=chunk_size, newest_first=False):
+        destination.write(json.dumps({field: creation.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False))
+        destination.write("\n")
+        count += 1
+    logging.info(f"Exported {count} creations")
+    return count
+
+
+def import_ndjson(memory: MemoryManager,
+                  source: Union[str, IO[str], Iterable[str]],
+                  batch_size: int = 10000) -> Dict[str, int]:
+    """
+    Import creations from newline-delimited JSON, skipping ones already stored.
+
+    Each batch is inserted with executemany in its own write transaction, and
+    its rows are added to the full-text index with one statement instead of a
+    trigger call each. The write lock is released after every batch, and the
+    import pauses briefly so that other writers, such as store_creation, get
+    their turn within their busy timeout. Readers see the imported creations a
+    batch at a time.
+
+    If the import fails, the batches committed so far stay imported. Running
+    the import again skips them as duplicates.
+
+    A creation is a duplicate when its content hash (tenant, timestamp, prompts,
+    artifact paths, metadata and tags) matches a stored creation or an earlier
+    line. Imported creations are not embedded for similarity search.
+
+    Args:
+        memory: Memory to import into; a tenant's manager imports every line into its own
+            tenant, a manager opened with ALL_TENANTS keeps each line's tenant_id
+        source: File path, text file or iterable of lines, as written by export_ndjson
+        batch_size: Number of creations per transaction
+
+    Returns:
+        Dict with the number of imported, duplicate and invalid lines
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            return import_ndjson(memory, f, batch_size)
+
+    start = time.perf_counter()
+    stats = {"imported": 0, "duplicates": 0, "invalid": 0}
+    conn = memory.pool.connection()
+    cache_size = conn.execute('PRAGMA cache_size').fetchone()[0]
+    conn.execute(f'PRAGMA cache_size=-{_IMPORT_CACHE_KIB}')
+    try:
+        batch: List[Tuple[Tuple[Any, ...], List[str]]] = []
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(_import_row(json.loads(line), memory.tenant_id))
+            except (ValueError, TypeError, KeyError) as e:
+                logging.warning(f"Skipping invalid creation on line {line_number}: {str(e)}")
+                stats["invalid"] += 1
+                continue
+            if len(batch) >= batch_size:
+                _write_batch(conn, batch, stats, memory.fts_enabled)
+                batch = []
+                time.sleep(_WRITER_PAUSE)
+        if batch:
+            _write_batch(conn, batch, stats, memory.fts_enabled)
+    finally:
+        conn.execute(f'PRAGMA cache_size={cache_size}')
+        if stats["imported"]:
+            bump_generation(memory.pool)
+
+    metrics.increment("memory.imported", stats["imported"])
+    logging.info(f"Imported {stats['imported']} creations in {time.perf_counter() - start:.2f}s "
+                 f"({stats['duplicates']} duplicates, {stats['invalid']} invalid lines skipped)")
+    return stats
+
+
+def _import_row(record: Dict[str, Any], tenant_id: str) -> Tuple[Tuple[Any, ...], List[str]]:
+    """
+    Build the stored columns of an imported creation.
+
+    Returns:
+        Tuple of the INSERT_CREATION_SQL row and the normalized tags
+    """
+    if not isinstance(record.get("user_prompt"), str) or not isinstance(record.get("enhanced_prompt"), str):
+        raise ValueError("user_prompt and enhanced_prompt are required")
+    metadata, tags = record.get("metadata"), record.get("tags")
+    if tags is not None and not isinstance(tags, list):
+        raise TypeError("tags must be a list")
+    timestamp = record.get("timestamp")
+    if timestamp is None:
+        created_at = record.get("created_at")
+        timestamp = (datetime.fromtimestamp(created_at / 1000) if created_at is not None else datetime.now()).isoformat()
+
+    creation_data = {
+        "tenant_id": (record.get("tenant_id") or DEFAULT_TENANT) if tenant_id == ALL_TENANTS else tenant_id,
+        "timestamp": timestamp,
+        "created_at": record.get("created_at") or epoch_millis(timestamp),
+        "user_prompt": record["user_prompt"],
+        "enhanced_prompt": record["enhanced_prompt"],
+        "image_path": record.get("image_path"),
+        "model_path": record.get("model_path"),
+        # Stored exactly as store_creation would, so hashes of re-imported creations match
+        "metadata": json.dumps(metadata) if metadata else None,
+        "tags": json.dumps(tags) if tags else None,
+        "summary": record.get("summary") or summarize_creation(record["user_prompt"], record["enhanced_prompt"])
+    }
+    creation_data["content_hash"] = content_hash(creation_data)
+    return tuple(creation_data[column] for column in CREATION_COLUMNS), normalize_tags(tags)
+
+
+def _write_batch(conn: sqlite3.Connection,
+                 batch: List[Tuple[Tuple[Any, ...], List[str]]],
+                 stats: Dict[str, int],
+                 fts_enabled: bool):
+    """Insert the creations of a batch that are neither stored nor repeated within it, in one transaction."""
+    hash_index = CREATION_COLUMNS.index("content_hash")
+    hashes = [values[hash_index] for values, _ in batch]
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        seen = set()
+        for start in range(0, len(hashes), _HASH_LOOKUP_SIZE):
+            chunk = hashes[start:start + _HASH_LOOKUP_SIZE]
+            seen.update(row[0] for row in conn.execute(
+                EXISTING_HASHES_SQL.format(placeholders=", ".join("?" * len(chunk))), chunk))
+
+        new = []
+        for item, digest in zip(batch, hashes):
+            if digest not in seen:
+                seen.add(digest)
+                new.append(item)
+        if fts_enabled:
+            conn.execute(FTS_DROP_INSERT_TRIGGER_SQL)
+        creation_ids = write_creations(conn, new)
+        if fts_enabled:
+            if creation_ids:
+                conn.execute(FTS_LOAD_SQL, (creation_ids[0],))
+            for statement in FTS_SCHEMA_SQL:
+                conn.execute(statement)
+        conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    stats["imported"] += len(new)
+    stats["duplicates"] += len(batch) - len(new)
@@ -0,0 +1,142 @@
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Dict, List
+
+_pools: Dict[str, "ConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class _ConnectionHolder:
+    """Thread-local owner of a connection, collected when its thread exits."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of persistent SQLite connections, one per thread.
+
+    Connections are opened once per thread and reused, so calls do not pay for
+    connection setup and keep their prepared statements cached. A connection is
+    closed when its thread exits, so short-lived threads do not leak them. The database
+    runs in WAL mode, so readers do not block the writer and concurrent writers
+    wait on a busy timeout instead of failing with "database is locked".
+
+    Pools from get_pool are shared and reference counted: each user calls
+    release() when done, and the last release closes the pool.
+    """
+
+    def __init__(self, db_path: str, busy_timeout: float = 5.0, cached_statements: int = 256):
+        """
+        Initialize the connection pool.
+
+        Args:
+            db_path: Path to the SQLite database file
+            busy_timeout: Seconds a connection waits for a lock held by another connection
+            cached_statements: Number of prepared statements cached per connection
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.references = 0
+        self.closed = False
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's connection, opening it on first use.
+
+        Use the connection as a context manager (``with conn:``) to commit or
+        roll back writes as one transaction.
+
+        Returns:
+            sqlite3.Connection: A connection owned by the calling thread
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path,
+                                   timeout=self.busy_timeout,
+                                   cached_statements=self.cached_statements,
+                                   check_same_thread=False)
+            # Lets freed pages be returned to the OS with incremental_vacuum; this only
+            # takes effect on a new database, so it must come before switching to WAL
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+            holder = _ConnectionHolder(conn)
+            # Thread-local values are dropped when their thread exits, which closes the connection
+            weakref.finalize(holder, self._release, conn)
+            self._local.holder = holder
+            with self._lock:
+                self._connections.append(conn)
+        return holder.conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        """Close the connection of a thread that has exited."""
+        with self._lock:
+            if conn not in self._connections:
+                # Already closed with the pool
+                return
+            self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Error closing database connection: {str(e)}")
+
+    def release(self) -> None:
+        """Give up a reference taken with get_pool, closing the pool once no user is left."""
+        with _pools_lock:
+            self.references -= 1
+            if self.references > 0:
+                return
+            self.close()
+
+    def close(self) -> None:
+        """Close the connections of all threads, whoever else still uses the pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self.closed = True
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"Error closing database connection: {str(e)}")
+        self._local = threading.local()
+
+
+def get_pool(db_path: str, busy_timeout: float = 5.0) -> ConnectionPool:
+    """
+    Get the shared connection pool for a database file.
+
+    All users of the same file share one pool, so per-thread connections are
+    reused across MemoryManager instances. Every call takes a reference that
+    the caller gives back with ConnectionPool.release(). A pool whose file was
+    deleted is replaced, since its connections would still point at the old file.
+
+    Args:
+        db_path: Path to the SQLite database file
+        busy_timeout: Seconds to wait for locks, used when the pool is created
+
+    Returns:
+        ConnectionPool: The pool for that file
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and (pool.closed or not os.path.exists(db_path)):
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = ConnectionPool(db_path, busy_timeout=busy_timeout)
+            _pools[key] = pool
+        pool.references += 1
+        return pool
@@ -0,0 +1,112 @@
+import re
+from typing import Any, Dict, List, Optional, Set
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _words(text: str) -> Set[str]:
+    """Get the set of lowercase words in a text."""
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """
+    Shorten text to at most max_chars, cutting at a word boundary.
+
+    Args:
+        text: Text to shorten
+        max_chars: Maximum length of the result, including the ellipsis
+
+    Returns:
+        str: The original text if it fits, otherwise a truncated copy ending in "..."
+    """
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - 3, 0)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(",;:") + "..."
+
+
+def summarize_creation(user_prompt: str, enhanced_prompt: str, max_chars: int = 200) -> str:
+    """
+    Build a compact summary of an enhanced prompt for use in memory context.
+
+    Whole leading sentences are kept while they fit, since enhanced prompts
+    usually open with the subject and follow with finer details.
+
+    Args:
+        user_prompt: Original user prompt
+        enhanced_prompt: Enhanced prompt used for generation
+        max_chars: Maximum length of the summary
+
+    Returns:
+        str: The summary
+    """
+    text = " ".join((enhanced_prompt or user_prompt).split())
+    summary = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        candidate = f"{summary} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        summary = candidate
+    return summary or truncate(text, max_chars)
+
+
+def build_context(creations: List[Dict[str, Any]],
+                  query: Optional[str] = None,
+                  limit: int = 3,
+                  max_chars: int = 1200,
+                  min_snippet_chars: int = 80,
+                  duplicate_threshold: float = 0.8) -> str:
+    """
+    Build a memory context string that fits a character budget.
+
+    Snippets are ranked by word overlap with the query, keeping the given
+    (most recent first) order for ties. Snippets that mostly repeat an earlier
+    one are skipped, and the last snippet is truncated to fill the budget.
+
+    Args:
+        creations: Candidate creations with user_prompt and summary or enhanced_prompt
+        query: Optional search term the context is built for
+        limit: Maximum number of creations to include
+        max_chars: Maximum length of the context
+        min_snippet_chars: Smallest truncated snippet worth including
+        duplicate_threshold: Word-overlap ratio above which a snippet counts as a duplicate
+
+    Returns:
+        String containing formatted context from memory
+    """
+    query_words = _words(query) if query else set()
+    candidates = []
+    for position, creation in enumerate(creations):
+        summary = creation.get("summary") or summarize_creation(creation["user_prompt"], creation.get("enhanced_prompt", ""))
+        words = _words(f"{creation['user_prompt']} {summary}")
+        relevance = len(query_words & words) / len(query_words) if query_words else 0.0
+        candidates.append((-relevance, position, creation["user_prompt"], summary, words))
+    candidates.sort(key=lambda candidate: candidate[:2])
+
+    context_parts = []
+    chosen_words: List[Set[str]] = []
+    used = 0
+    for _, _, user_prompt, summary, words in candidates:
+        if len(context_parts) >= limit:
+            break
+        if any(len(words & other) / max(len(words | other), 1) >= duplicate_threshold for other in chosen_words):
+            continue
+
+        separator = 1 if context_parts else 0
+        part = f"Previous creation: '{user_prompt}' - Enhanced as: '{summary}'"
+        remaining = max_chars - used - separator
+        if len(part) > remaining:
+            if remaining < min_snippet_chars:
+                break
+            part = truncate(part[:-1], remaining - 1) + "'"
+
+        context_parts.append(part)
+        chosen_words.append(words)
+        used += separator + len(part)
+
+    return "\n".join(context_parts)
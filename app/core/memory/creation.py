@@ -0,0 +1,147 @@
+import json
+import sqlite3
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional
+
+_UNSET = object()
+
+
+class Creation(MutableMapping):
+    """
+    Compact record of a stored creation.
+
+    Columns are kept in slots rather than a per-row dict, and the JSON metadata
+    and tags columns are only decoded when first read, so building context from
+    many rows does not pay for fields it never touches. The record behaves like
+    the dictionaries MemoryManager used to return: item access, get(), iteration,
+    dict() and comparison with dicts all work, and only the columns that were
+    actually selected are present. Fields outside the creations table, such as
+    a search similarity, are kept alongside.
+    """
+
+    FIELDS = ("id", "tenant_id", "timestamp", "created_at", "user_prompt", "enhanced_prompt",
+              "image_path", "model_path", "metadata", "tags", "summary", "content_hash")
+    JSON_FIELDS = ("metadata", "tags")
+
+    __slots__ = ("id", "tenant_id", "timestamp", "created_at", "user_prompt", "enhanced_prompt",
+                 "image_path", "model_path", "summary", "content_hash",
+                 "_metadata", "_metadata_json", "_tags", "_tags_json", "_extra")
+
+    def __init__(self, **fields: Any):
+        """
+        Initialize a record from decoded values.
+
+        Args:
+            **fields: Column values; metadata and tags as Python objects
+        """
+        self._metadata = self._metadata_json = self._tags = self._tags_json = _UNSET
+        self._extra: Optional[Dict[str, Any]] = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Creation":
+        """
+        Build a record from a database row, leaving its JSON columns undecoded.
+
+        Args:
+            row: Row of a query on the creations table
+
+        Returns:
+            Creation: Record holding exactly the row's columns
+        """
+        creation = cls.__new__(cls)
+        creation._metadata = creation._metadata_json = creation._tags = creation._tags_json = _UNSET
+        creation._extra = None
+        for key in row.keys():
+            if key in cls.JSON_FIELDS:
+                setattr(creation, f"_{key}_json", row[key])
+            else:
+                creation[key] = row[key]
+        return creation
+
+    def _decoded(self, name: str) -> Any:
+        value = getattr(self, f"_{name}")
+        if value is _UNSET:
+            raw = getattr(self, f"_{name}_json")
+            if raw is _UNSET:
+                return _UNSET
+            # Empty values are kept as stored, like the eagerly decoded dictionaries did
+            value = json.loads(raw) if raw else raw
+            setattr(self, f"_{name}", value)
+        return value
+
+    @property
+    def metadata(self) -> Any:
+        """Decoded metadata, or None if the creation has none."""
+        value = self._decoded("metadata")
+        return None if value is _UNSET else value
+
+    @property
+    def tags(self) -> Any:
+        """Decoded tags, or None if the creation has none."""
+        value = self._decoded("tags")
+        return None if value is _UNSET else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.JSON_FIELDS:
+            value = self._decoded(key)
+        elif key in self.FIELDS:
+            value = getattr(self, key, _UNSET)
+        else:
+            value = self._extra.get(key, _UNSET) if self._extra else _UNSET
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self.JSON_FIELDS:
+            setattr(self, f"_{key}", value)
+            setattr(self, f"_{key}_json", _UNSET)
+        elif key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in self.JSON_FIELDS:
+            setattr(self, f"_{key}", _UNSET)
+            setattr(self, f"_{key}_json", _UNSET)
+        elif key in self.FIELDS:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in self.JSON_FIELDS:
+            return getattr(self, f"_{key}") is not _UNSET or getattr(self, f"_{key}_json") is not _UNSET
+        if key in self.FIELDS:
+            return hasattr(self, key)
+        return bool(self._extra) and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if key in self:
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> "Creation":
+        """Get a shallow copy, keeping undecoded JSON undecoded."""
+        creation = Creation.__new__(Creation)
+        for name in self.__slots__:
+            if hasattr(self, name):
+                setattr(creation, name, getattr(self, name))
+        if self._extra is not None:
+            creation._extra = dict(self._extra)
+        return creation
+
+    def __repr__(self) -> str:
+        return f"Creation(id={getattr(self, 'id', None)!r}, user_prompt={getattr(self, 'user_prompt', None)!r})"
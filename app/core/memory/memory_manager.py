@@ -1,10 +1,419 @@
+import hashlib
 import json
 import logging
 import os
+import re
 import sqlite3
+import threading
 import time
+import weakref
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Union
+from typing import Callable, Dict, Iterator, List, Optional, Any, Sequence, Tuple, Union
+
+from core.memory.connection_pool import ConnectionPool, get_pool
+from core.memory.context_builder import build_context, summarize_creation
+from core.memory.creation import Creation
+from core.memory.vector_index import get_vector_index, numpy_available
+from core.memory.write_behind import close_writer, get_writer
+from core.utils.lru_cache import LRUCache
+
+# Tenant of creations stored before they were partitioned, and of managers given no tenant
+DEFAULT_TENANT = "super-user"
+# Tenant ID of managers reading the creations of every tenant, for admin tools; they cannot store creations
+ALL_TENANTS = "*"
+
+# Statements are kept as constants so each pooled connection reuses their prepared form
+INSERT_CREATION_SQL = '''
+INSERT INTO creations 
+(tenant_id, timestamp, created_at, user_prompt, enhanced_prompt, image_path, model_path, metadata, tags, summary,
+ content_hash)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Columns set by INSERT_CREATION_SQL, in its parameter order
+CREATION_COLUMNS = ("tenant_id", "timestamp", "created_at", "user_prompt", "enhanced_prompt",
+                    "image_path", "model_path", "metadata", "tags", "summary", "content_hash")
+# Columns identifying a creation's content, hashed to recognize the same creation when imported again
+HASHED_COLUMNS = ("tenant_id", "timestamp", "user_prompt", "enhanced_prompt",
+                  "image_path", "model_path", "metadata", "tags")
+SELECT_BY_IDS_SQL = 'SELECT * FROM creations WHERE id IN ({placeholders})'
+SEARCH_SQL = '''
+SELECT {columns} FROM creations c
+WHERE (user_prompt LIKE ? OR enhanced_prompt LIKE ? OR tags LIKE ?){filters}
+ORDER BY created_at DESC, id DESC LIMIT ?
+'''
+FILTER_SQL = 'SELECT {columns} FROM creations c WHERE 1{filters} ORDER BY created_at DESC, id DESC LIMIT ?'
+RECENT_IDS_SQL = 'SELECT id FROM creations c WHERE 1{filters} ORDER BY created_at DESC, id DESC LIMIT ?'
+# Keyset pages: each continues strictly after the (created_at, id) of the previous page's last row
+PAGE_NEWEST_FIRST_SQL = '''
+SELECT * FROM creations c WHERE (created_at, id) < (?, ?){filters}
+ORDER BY created_at DESC, id DESC LIMIT ?
+'''
+PAGE_OLDEST_FIRST_SQL = '''
+SELECT * FROM creations c WHERE (created_at, id) > (?, ?){filters}
+ORDER BY created_at, id LIMIT ?
+'''
+_MAX_KEY = (2 ** 63 - 1, 2 ** 63 - 1)
+_MIN_KEY = (-2 ** 63, -2 ** 63)
+# Columns memory context is built from
+CONTEXT_FIELDS = ("id", "created_at", "user_prompt", "summary")
+# Projection used for memory context, answered from the covering index alone
+RECENT_CONTEXT_SQL = '''
+SELECT id, created_at, user_prompt, summary FROM creations c WHERE 1{filters}
+ORDER BY created_at DESC, id DESC LIMIT ?
+'''
+
+# Recency queries walk these indexes backwards from the newest row instead of sorting the table.
+# Queries of one tenant use the tenant-prefixed index, which also covers memory context, so
+# they only touch that tenant's rows however many tenants share the database; queries across
+# all tenants use the plain recency index.
+INDEX_SQL = [
+    'CREATE INDEX IF NOT EXISTS idx_creations_recent ON creations (created_at DESC, id DESC)',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_creations_tenant_context
+    ON creations (tenant_id, created_at DESC, id DESC, user_prompt, summary)
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_creations_content_hash ON creations (content_hash)'
+]
+
+# Normalized tags; the primary key doubles as the index for tag lookups within a tenant
+TAGS_SCHEMA_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS creation_tags (
+        tenant_id TEXT NOT NULL,
+        creation_id INTEGER NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (tenant_id, tag, creation_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_creation_tags_creation ON creation_tags (creation_id)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS creation_tags_delete AFTER DELETE ON creations BEGIN
+        DELETE FROM creation_tags WHERE creation_id = old.id;
+    END
+    '''
+]
+INSERT_TAG_SQL = 'INSERT OR IGNORE INTO creation_tags (tenant_id, creation_id, tag) VALUES (?, ?, ?)'
+TAG_COUNTS_SQL = '''
+SELECT tag, COUNT(*) AS uses FROM creation_tags WHERE 1{filters}
+GROUP BY tag ORDER BY uses DESC, tag LIMIT ?
+'''
+
+# Full-text index over the searchable columns, kept in sync with creations by triggers.
+# The tenant ID is indexed too, so a tenant's searches only match its own creations.
+FTS_SCHEMA_SQL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS creations_fts USING fts5(
+        user_prompt, enhanced_prompt, tags, tenant_id,
+        content='creations', content_rowid='id'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS creations_fts_insert AFTER INSERT ON creations BEGIN
+        INSERT INTO creations_fts(rowid, user_prompt, enhanced_prompt, tags, tenant_id)
+        VALUES (new.id, new.user_prompt, new.enhanced_prompt, new.tags, new.tenant_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS creations_fts_delete AFTER DELETE ON creations BEGIN
+        INSERT INTO creations_fts(creations_fts, rowid, user_prompt, enhanced_prompt, tags, tenant_id)
+        VALUES ('delete', old.id, old.user_prompt, old.enhanced_prompt, old.tags, old.tenant_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS creations_fts_update
+    AFTER UPDATE OF user_prompt, enhanced_prompt, tags ON creations BEGIN
+        INSERT INTO creations_fts(creations_fts, rowid, user_prompt, enhanced_prompt, tags, tenant_id)
+        VALUES ('delete', old.id, old.user_prompt, old.enhanced_prompt, old.tags, old.tenant_id);
+        INSERT INTO creations_fts(rowid, user_prompt, enhanced_prompt, tags, tenant_id)
+        VALUES (new.id, new.user_prompt, new.enhanced_prompt, new.tags, new.tenant_id);
+    END
+    '''
+]
+# BM25 ranks best matches lowest; the recency boost subtracts up to its weight for
+# creations from today, decaying with age in days (created_at and now are epoch ms). Column weights favour matches in
+# the user's own prompt and tags over the longer enhanced prompt; the tenant ID does not count.
+FTS_SEARCH_SQL = '''
+SELECT {columns} FROM creations_fts
+JOIN creations c ON c.id = creations_fts.rowid
+WHERE creations_fts MATCH ?{filters}
+ORDER BY bm25(creations_fts, 2.0, 1.0, 2.0, 0.0)
+         - ? / (1.0 + max((? - c.created_at) / 86400000.0, 0.0)),
+         c.id DESC
+LIMIT ?
+'''
+
+# FTS triggers and table of databases created before creations were partitioned by tenant
+FTS_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS creations_fts_insert',
+    'DROP TRIGGER IF EXISTS creations_fts_delete',
+    'DROP TRIGGER IF EXISTS creations_fts_update',
+    'DROP TABLE IF EXISTS creations_fts'
+]
+
+_TOKEN_RE = re.compile(r"\w+")
+# Words that say nothing about what a creation shows, including the phrasing of
+# references to past creations ("like the dragon I made before")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before but by can could did do does earlier for
+from had has have her his how i in into is it its just last like made make me more my of on one or our
+please previous previously same show similar some than that the their them then there these they this
+time to was we were what when which who with would you your create created
+""".split())
+
+# Session caches live as long as their connection pool, which is replaced when
+# its database file is, so cached creations never outlive the rows they mirror
+_session_caches: "weakref.WeakKeyDictionary[ConnectionPool, LRUCache]" = weakref.WeakKeyDictionary()
+_session_caches_lock = threading.Lock()
+# Memory contexts are cached under the write generation they were built at: every
+# stored or deleted creation advances it, so later lookups never see stale entries,
+# which then simply age out of the cache
+_context_caches: "weakref.WeakKeyDictionary[ConnectionPool, LRUCache]" = weakref.WeakKeyDictionary()
+_generations: "weakref.WeakKeyDictionary[ConnectionPool, int]" = weakref.WeakKeyDictionary()
+
+
+def get_session_cache(pool: ConnectionPool, max_size: int = 1024, ttl: Optional[float] = 3600) -> LRUCache:
+    """
+    Get the cache of parsed creations shared by all managers of a database.
+    
+    Args:
+        pool: Connection pool of the database
+        max_size: Maximum number of creations to keep, used when the cache is created
+        ttl: Seconds a creation stays cached, used when the cache is created
+        
+    Returns:
+        LRUCache: Cache of creation dictionaries keyed by creation ID
+    """
+    with _session_caches_lock:
+        cache = _session_caches.get(pool)
+        if cache is None:
+            cache = LRUCache(max_size=max_size, ttl=ttl)
+            _session_caches[pool] = cache
+        return cache
+
+
+def vector_index_path_for(db_path: str, tenant_id: str = DEFAULT_TENANT) -> str:
+    """
+    Get the default path prefix of a tenant's embedding index, next to the database.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        tenant_id: Tenant whose index it is
+        
+    Returns:
+        str: Path prefix of the index files
+    """
+    base = f"{os.path.splitext(db_path)[0]}_vectors"
+    if tenant_id == DEFAULT_TENANT:
+        return base
+    # Tenant IDs are hashed so any ID gives a safe, fixed-length file name
+    return f"{base}_{hashlib.sha1(tenant_id.encode('utf-8')).hexdigest()[:16]}"
+
+
+def get_context_cache(pool: ConnectionPool, max_size: int = 256) -> LRUCache:
+    """
+    Get the cache of formatted memory contexts shared by all managers of a database.
+    
+    Args:
+        pool: Connection pool of the database
+        max_size: Maximum number of contexts to keep, used when the cache is created
+        
+    Returns:
+        LRUCache: Cache of context strings keyed by write generation and request
+    """
+    with _session_caches_lock:
+        cache = _context_caches.get(pool)
+        if cache is None:
+            cache = LRUCache(max_size=max_size)
+            _context_caches[pool] = cache
+        return cache
+
+
+def memory_generation(pool: ConnectionPool) -> int:
+    """
+    Get the write generation of a database, which changes whenever its creations do.
+    
+    Args:
+        pool: Connection pool of the database
+        
+    Returns:
+        int: Number of committed changes to the creations since the pool was opened
+    """
+    with _session_caches_lock:
+        return _generations.get(pool, 0)
+
+
+def bump_generation(pool: ConnectionPool) -> int:
+    """
+    Advance the write generation of a database after its creations changed.
+    
+    Must be called after the change has committed and session memory and the
+    similarity index reflect it, so a context built from the old state is never
+    cached under the new generation.
+    
+    Args:
+        pool: Connection pool of the database
+        
+    Returns:
+        int: The new generation
+    """
+    with _session_caches_lock:
+        generation = _generations.get(pool, 0) + 1
+        _generations[pool] = generation
+        return generation
+
+
+def select_columns(fields: Optional[Sequence[str]] = None) -> str:
+    """
+    Build the column list of a query on creations (aliased c).
+    
+    Args:
+        fields: Creation fields to select, or None for all columns
+        
+    Returns:
+        str: The SELECT column list
+    """
+    if fields is None:
+        return "c.*"
+    unknown = set(fields) - set(Creation.FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown creation fields: {sorted(unknown)}")
+    return ", ".join(f"c.{field}" for field in fields)
+
+
+def build_match_query(query: str, tenant_id: Optional[str] = None) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching all of its words by prefix.
+    
+    Stopwords and words of one or two letters are left out, since as prefixes
+    they would match nearly every creation.
+    
+    Args:
+        query: Free-text search term
+        tenant_id: Only match creations of this tenant, or None to match any tenant's
+        
+    Returns:
+        The FTS5 MATCH expression, or None if the text has no searchable words
+    """
+    tokens = [token for token in _TOKEN_RE.findall(query.lower())
+              if token not in STOPWORDS and (len(token) > 2 or not token.isalpha())]
+    if not tokens:
+        return None
+    # Words only match the text columns, never the tenant ID
+    match_query = "{user_prompt enhanced_prompt tags} : (" + " AND ".join(
+        f'"{token}"*' for token in dict.fromkeys(tokens)) + ")"
+    if tenant_id is not None and _TOKEN_RE.search(tenant_id):
+        # Narrows the match to the tenant's rows; the exact tenant_id comparison stays in SQL
+        match_query = 'tenant_id : "{}" AND {}'.format(tenant_id.replace('"', '""'), match_query)
+    return match_query
+
+
+def write_creations(conn: sqlite3.Connection,
+                    creations: List[Tuple[Tuple[Any, ...], List[str]]]) -> List[int]:
+    """
+    Insert a batch of creations and their tags with one statement each.
+    
+    Must run inside a write transaction (BEGIN IMMEDIATE), so no other writer can
+    take IDs in between: AUTOINCREMENT then hands out consecutive IDs following
+    the last one recorded in sqlite_sequence.
+    
+    Args:
+        conn: Connection with an open write transaction
+        creations: Tuples of an INSERT_CREATION_SQL row (starting with the tenant ID) and the creation's normalized tags
+        
+    Returns:
+        List of the new creation IDs, in batch order
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'creations'").fetchone()
+    first_id = (row[0] if row else 0) + 1
+    conn.executemany(INSERT_CREATION_SQL, [values for values, _ in creations])
+    
+    creation_ids = list(range(first_id, first_id + len(creations)))
+    conn.executemany(INSERT_TAG_SQL, [
+        (values[0], creation_id, tag) for creation_id, (values, tags) in zip(creation_ids, creations) for tag in tags
+    ])
+    return creation_ids
+
+
+def content_hash(creation_data: Dict[str, Any]) -> str:
+    """
+    Hash the content of a creation, as stored, to detect duplicates.
+    
+    Args:
+        creation_data: Stored column values, with metadata and tags as JSON
+        
+    Returns:
+        str: Hex digest of the HASHED_COLUMNS values
+    """
+    # Unit separators keep values from running into each other; None hashes like an empty value
+    content = "\x1f".join("" if value is None else str(value)
+                           for value in (creation_data.get(column) for column in HASHED_COLUMNS))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def epoch_millis(timestamp: str) -> int:
+    """
+    Convert an ISO-8601 timestamp, as stored by earlier versions, to epoch milliseconds.
+    
+    Args:
+        timestamp: ISO-8601 timestamp; naive values are taken as local time
+        
+    Returns:
+        int: Milliseconds since the epoch, or 0 if the timestamp is unreadable
+    """
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    except (ValueError, TypeError):
+        logging.warning(f"Unreadable creation timestamp: {timestamp!r}")
+        return 0
+
+
+def normalize_tags(tags: Optional[List[str]]) -> List[str]:
+    """
+    Normalize tags for the tags table: trimmed, lowercase and without duplicates.
+    
+    Args:
+        tags: Tags as given by the caller
+        
+    Returns:
+        List of normalized tags in their original order
+    """
+    normalized = (tag.strip().lower() for tag in tags or [] if isinstance(tag, str))
+    return list(dict.fromkeys(tag for tag in normalized if tag))
+
+
+def build_tag_filters(tags_any: Optional[List[str]] = None,
+                      tags_all: Optional[List[str]] = None,
+                      tenant_id: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """
+    Build SQL conditions restricting creations (aliased c) by tenant and tags.
+    
+    Args:
+        tags_any: Keep creations having at least one of these tags
+        tags_all: Keep creations having every one of these tags
+        tenant_id: Keep creations of this tenant, or None to keep every tenant's
+        
+    Returns:
+        Tuple of the conditions, each prefixed with AND, and their parameters
+    """
+    filters, params = "", []
+    tags_any, tags_all = normalize_tags(tags_any), normalize_tags(tags_all)
+    # Tag lookups of one tenant search its own range of the tags primary key
+    tag_scope, scope_params = ("tenant_id = ? AND ", [tenant_id]) if tenant_id is not None else ("", [])
+    if tenant_id is not None:
+        filters += " AND c.tenant_id = ?"
+        params.append(tenant_id)
+    if tags_any:
+        placeholders = ", ".join("?" * len(tags_any))
+        filters += f" AND c.id IN (SELECT creation_id FROM creation_tags WHERE {tag_scope}tag IN ({placeholders}))"
+        params.extend(scope_params + tags_any)
+    if tags_all:
+        placeholders = ", ".join("?" * len(tags_all))
+        filters += (f" AND c.id IN (SELECT creation_id FROM creation_tags WHERE {tag_scope}tag IN ({placeholders})"
+                    f" GROUP BY creation_id HAVING COUNT(*) = ?)")
+        params.extend(scope_params + tags_all)
+        params.append(len(tags_all))
+    return filters, params
 
 
 class MemoryManager:
@@ -16,50 +425,260 @@ class MemoryManager:
     - Short-term memory during a session
     - Long-term memory using SQLite database
     - Querying and retrieving past creations
+    
+    Database access goes through a shared pool of per-thread connections in WAL
+    mode, so concurrent requests can read while one of them writes. In
+    write-behind mode, new creations are queued and written in batches by a
+    background thread instead of committing on the caller's thread.
+    
+    Creations are partitioned by tenant: every manager reads and writes the
+    creations of one tenant ID, through indexes prefixed with it, so a tenant's
+    queries cost the same however many other tenants share the database. A
+    manager opened with ALL_TENANTS reads across tenants for admin tools.
     """
     
-    def __init__(self, db_path: str = "datastore/memory.db"):
+    def __init__(self, 
+                 db_path: str = "datastore/memory.db", 
+                 busy_timeout: float = 5.0,
+                 write_behind: bool = False,
+                 write_batch_size: int = 64,
+                 write_flush_interval: float = 0.05,
+                 session_size: int = 1024,
+                 session_ttl: Optional[float] = 3600,
+                 embedder: Optional[Callable[[str], Optional[List[float]]]] = None,
+                 vector_index_path: Optional[str] = None,
+                 tenant_id: str = DEFAULT_TENANT,
+                 context_cache_size: int = 256):
         """
         Initialize the memory manager.
         
         Args:
             db_path: Path to the SQLite database file
+            busy_timeout: Seconds to wait for a write lock held by another connection
+            write_behind: Queue new creations for a background writer that commits them in batches
+            write_batch_size: Maximum number of creations per write-behind transaction
+            write_flush_interval: Seconds the writer waits for more creations before committing
+            session_size: Maximum number of creations kept in session memory
+            session_ttl: Seconds a creation stays in session memory, or None to keep it until evicted
+            embedder: Function returning an embedding for a text, enables similarity search
+            vector_index_path: Path prefix of the embedding index files, defaults to one next to the database
+            tenant_id: User or tenant whose creations are stored and read, or ALL_TENANTS to read everyone's
+            context_cache_size: Maximum number of formatted memory contexts cached for repeated queries
         """
         self.db_path = db_path
-        self.session_memory = {}  # In-memory storage for current session
+        self.tenant_id = tenant_id
+        self.fts_enabled = False
+        self.write_behind = write_behind
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self.embedder = None
+        self.vectors = None
         
         # Ensure datastore directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
+        self.pool = get_pool(db_path, busy_timeout=busy_timeout)
+        
+        # Short-term memory: recently stored and read creations, shared with other managers of the database
+        self.session_memory = get_session_cache(self.pool, max_size=session_size, ttl=session_ttl)
+        self.context_cache = get_context_cache(self.pool, max_size=context_cache_size)
+        
         # Initialize database
         self._init_db()
         
+        if embedder is not None:
+            self.set_embedder(embedder, vector_index_path)
+        
+    def set_embedder(self, 
+                     embedder: Callable[[str], Optional[List[float]]], 
+                     vector_index_path: Optional[str] = None):
+        """
+        Enable similarity search: embed new creations and index them.
+        
+        Args:
+            embedder: Function returning an embedding for a text, or None on failure
+            vector_index_path: Path prefix of the embedding index files, defaults to one next to the database
+        """
+        if not numpy_available():
+            logging.warning("NumPy is not installed, similarity search over memory is disabled")
+            return
+        if self.tenant_id == ALL_TENANTS:
+            logging.warning("Similarity search runs within one tenant, it is disabled across all tenants")
+            return
+        self.embedder = embedder
+        self.vectors = get_vector_index(vector_index_path or vector_index_path_for(self.db_path, self.tenant_id))
+    
+    def _tenant_filter(self) -> Optional[str]:
+        """Tenant ID to restrict queries to, or None when reading across all tenants."""
+        return None if self.tenant_id == ALL_TENANTS else self.tenant_id
+        
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Get an embedding for a text, or None if similarity search is disabled or embedding fails."""
+        if self.embedder is None:
+            return None
+        try:
+            return self.embedder(text)
+        except Exception as e:
+            logging.error(f"Error embedding text for memory: {str(e)}")
+            return None
+        
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued creations have been written.
+        
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+            
+        Returns:
+            bool: True if nothing is left in the write-behind queue
+        """
+        if not self.write_behind:
+            return True
+        return self._writer().flush(timeout)
+    
+    def close(self):
+        """
+        Write queued creations durably and release the database connection pool.
+        
+        The pool is shared by every manager of the database; its connections are
+        closed once the last of them is closed.
+        """
+        if self.write_behind:
+            close_writer(self.pool)
+        self.pool.release()
+    
+    def _writer(self):
+        """Get the background writer shared by all managers of this database."""
+        return get_writer(self.pool, write_creations,
+                          batch_size=self.write_batch_size,
+                          flush_interval=self.write_flush_interval)
+        
     def _init_db(self):
         """Initialize the SQLite database with required tables if they don't exist."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Creations table - stores all generated content
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS creations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                user_prompt TEXT NOT NULL,
-                enhanced_prompt TEXT NOT NULL,
-                image_path TEXT,
-                model_path TEXT,
-                metadata TEXT,
-                tags TEXT
-            )
-            ''')
-            
-            conn.commit()
-            conn.close()
+            conn = self.pool.connection()
+            with conn:
+                cursor = conn.cursor()
+                
+                # Creations table - stores all generated content
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS creations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    created_at INTEGER,
+                    user_prompt TEXT NOT NULL,
+                    enhanced_prompt TEXT NOT NULL,
+                    image_path TEXT,
+                    model_path TEXT,
+                    metadata TEXT,
+                    tags TEXT,
+                    summary TEXT,
+                    tenant_id TEXT NOT NULL DEFAULT 'super-user',
+                    content_hash TEXT
+                )
+                ''')
+                
+                self._migrate(cursor)
+                for statement in INDEX_SQL:
+                    cursor.execute(statement)
+                self._init_tags(cursor)
+                self.fts_enabled = self._init_fts(cursor)
+                
             logging.info(f"Memory database initialized at {self.db_path}")
         except Exception as e:
             logging.error(f"Error initializing memory database: {str(e)}")
     
+    def _migrate(self, cursor: sqlite3.Cursor):
+        """Bring databases created by earlier versions up to the current schema."""
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(creations)')}
+        
+        if "summary" not in columns:
+            cursor.execute('ALTER TABLE creations ADD COLUMN summary TEXT')
+            rows = cursor.execute('SELECT id, user_prompt, enhanced_prompt FROM creations').fetchall()
+            cursor.executemany('UPDATE creations SET summary = ? WHERE id = ?', [
+                (summarize_creation(user_prompt, enhanced_prompt), creation_id)
+                for creation_id, user_prompt, enhanced_prompt in rows
+            ])
+            logging.info(f"Added summaries for {len(rows)} existing creations")
+        
+        if "created_at" not in columns:
+            cursor.execute('ALTER TABLE creations ADD COLUMN created_at INTEGER')
+            rows = cursor.execute('SELECT id, timestamp FROM creations').fetchall()
+            cursor.executemany('UPDATE creations SET created_at = ? WHERE id = ?', [
+                (epoch_millis(timestamp), creation_id) for creation_id, timestamp in rows
+            ])
+            logging.info(f"Added epoch timestamps for {len(rows)} existing creations")
+        
+        if "tenant_id" not in columns:
+            # Existing creations all belonged to the single user the app used to serve
+            cursor.execute(f"ALTER TABLE creations ADD COLUMN tenant_id TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+            cursor.execute('DROP INDEX IF EXISTS idx_creations_recent_context')
+            logging.info(f"Assigned existing creations to tenant {DEFAULT_TENANT!r}")
+        
+        if "content_hash" not in columns:
+            cursor.execute('ALTER TABLE creations ADD COLUMN content_hash TEXT')
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(f'SELECT id, {", ".join(HASHED_COLUMNS)} FROM creations').fetchall()
+            cursor.row_factory = None
+            cursor.executemany('UPDATE creations SET content_hash = ? WHERE id = ?', [
+                (content_hash(dict(row)), row["id"]) for row in rows
+            ])
+            logging.info(f"Added content hashes for {len(rows)} existing creations")
+    
+    def _init_tags(self, cursor: sqlite3.Cursor):
+        """Create the normalized tags table, filling it from the JSON tags of existing creations."""
+        existed = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'creation_tags'"
+        ).fetchone() is not None
+        if existed and "tenant_id" not in {row[1] for row in cursor.execute('PRAGMA table_info(creation_tags)')}:
+            # Its primary key cannot gain the tenant prefix in place, so it is rebuilt
+            cursor.execute('DROP TABLE creation_tags')
+            existed = False
+        
+        for statement in TAGS_SCHEMA_SQL:
+            cursor.execute(statement)
+        
+        if not existed:
+            rows = cursor.execute('SELECT id, tenant_id, tags FROM creations WHERE tags IS NOT NULL').fetchall()
+            tag_rows = []
+            for creation_id, tenant_id, tags in rows:
+                try:
+                    tag_rows.extend((tenant_id, creation_id, tag) for tag in normalize_tags(json.loads(tags)))
+                except (ValueError, TypeError) as e:
+                    logging.warning(f"Skipping unreadable tags of creation {creation_id}: {str(e)}")
+            cursor.executemany(INSERT_TAG_SQL, tag_rows)
+            if rows:
+                logging.info(f"Indexed tags of {len(rows)} existing creations")
+    
+    def _init_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the full-text index and its sync triggers, backfilling existing creations.
+        
+        Returns:
+            bool: True if full-text search is available, False to fall back to LIKE
+        """
+        existed = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'creations_fts'"
+        ).fetchone() is not None
+        
+        try:
+            if existed and "tenant_id" not in {row[1] for row in cursor.execute('PRAGMA table_info(creations_fts)')}:
+                for statement in FTS_DROP_SQL:
+                    cursor.execute(statement)
+                existed = False
+            for statement in FTS_SCHEMA_SQL:
+                cursor.execute(statement)
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Full-text search unavailable, falling back to LIKE search: {str(e)}")
+            return False
+        
+        if not existed:
+            count = cursor.execute('SELECT COUNT(*) FROM creations').fetchone()[0]
+            if count:
+                cursor.execute("INSERT INTO creations_fts(creations_fts) VALUES ('rebuild')")
+                logging.info(f"Indexed {count} existing creations for full-text search")
+        return True
+    
     def store_creation(self, 
                        user_prompt: str, 
                        enhanced_prompt: str, 
@@ -70,6 +689,9 @@ class MemoryManager:
         """
         Store a creation in both short-term and long-term memory.
         
+        In write-behind mode this waits for the batch holding the creation to
+        commit; use submit_creation to avoid waiting.
+        
         Args:
             user_prompt: Original user prompt
             enhanced_prompt: Enhanced prompt used for generation
@@ -81,55 +703,199 @@ class MemoryManager:
         Returns:
             int: ID of the stored creation
         """
+        if self.tenant_id == ALL_TENANTS:
+            logging.error("Cannot store a creation without a tenant")
+            return -1
+        
+        if self.write_behind:
+            try:
+                return self.submit_creation(user_prompt, enhanced_prompt, image_path,
+                                            model_path, metadata, tags).result()
+            except Exception as e:
+                logging.error(f"Error storing creation in long-term memory: {str(e)}")
+                return -1
+        
+        creation_data = self._prepare_creation(user_prompt, enhanced_prompt, image_path, model_path, metadata, tags)
+        embedding = self._embed(f"{user_prompt}. {creation_data['summary']}")
+        
+        try:
+            # Store in long-term memory (SQLite)
+            conn = self.pool.connection()
+            with conn:
+                cursor = conn.execute(INSERT_CREATION_SQL, [creation_data[column] for column in CREATION_COLUMNS])
+                creation_id = cursor.lastrowid
+                
+                # Tags are written in the same transaction as the creation
+                conn.executemany(INSERT_TAG_SQL, [(self.tenant_id, creation_id, tag) for tag in normalize_tags(tags)])
+            
+            # Store in session memory and the similarity index
+            self._remember(creation_id, creation_data, metadata, tags, embedding)
+            logging.info(f"Creation stored with ID: {creation_id}")
+            return creation_id
+            
+        except Exception as e:
+            logging.error(f"Error storing creation in long-term memory: {str(e)}")
+            return -1
+    
+    def submit_creation(self, 
+                        user_prompt: str, 
+                        enhanced_prompt: str, 
+                        image_path: Optional[str] = None,
+                        model_path: Optional[str] = None,
+                        metadata: Optional[Dict[str, Any]] = None,
+                        tags: Optional[List[str]] = None) -> Future:
+        """
+        Store a creation without waiting for it to be written.
+        
+        In write-behind mode the creation is queued for the background writer;
+        otherwise it is stored immediately.
+        
+        Args:
+            user_prompt: Original user prompt
+            enhanced_prompt: Enhanced prompt used for generation
+            image_path: Path to the generated image
+            model_path: Path to the generated 3D model
+            metadata: Additional metadata about the creation
+            tags: List of tags for searching
+            
+        Returns:
+            Future: Resolves to the ID of the stored creation once it is committed
+            
+        Raises:
+            ValueError: If the prompts are missing or the manager has no single tenant
+        """
+        if not self.write_behind:
+            future = Future()
+            future.set_result(self.store_creation(user_prompt, enhanced_prompt, image_path,
+                                                  model_path, metadata, tags))
+            return future
+        
+        if self.tenant_id == ALL_TENANTS:
+            raise ValueError("Cannot store a creation without a tenant")
+        # Checked here, so a bad creation fails its caller instead of the batch it would be queued in
+        if not isinstance(user_prompt, str) or not isinstance(enhanced_prompt, str):
+            raise ValueError("user_prompt and enhanced_prompt are required")
+        
+        creation_data = self._prepare_creation(user_prompt, enhanced_prompt, image_path, model_path, metadata, tags)
+        embedding = self._embed(f"{user_prompt}. {creation_data['summary']}")
+        values = tuple(creation_data[column] for column in CREATION_COLUMNS)
+        future = self._writer().submit((values, normalize_tags(tags)))
+        
+        def remember(done: Future):
+            if done.exception() is None:
+                self._remember(done.result(), creation_data, metadata, tags, embedding)
+        
+        future.add_done_callback(remember)
+        return future
+    
+    def _prepare_creation(self, 
+                          user_prompt: str, 
+                          enhanced_prompt: str, 
+                          image_path: Optional[str],
+                          model_path: Optional[str],
+                          metadata: Optional[Dict[str, Any]],
+                          tags: Optional[List[str]]) -> Dict[str, Any]:
+        """
+        Build the stored columns of a creation.
+        
+        Returns:
+            Dict of the CREATION_COLUMNS values, with metadata and tags as JSON
+        """
         # Format timestamp
-        timestamp = datetime.now().isoformat()
+        now = datetime.now()
+        timestamp = now.isoformat()
         
         # Prepare data for storage
         creation_data = {
+            "tenant_id": self.tenant_id,
             "timestamp": timestamp,
+            "created_at": int(now.timestamp() * 1000),
             "user_prompt": user_prompt,
             "enhanced_prompt": enhanced_prompt,
             "image_path": image_path,
             "model_path": model_path,
             "metadata": json.dumps(metadata) if metadata else None,
-            "tags": json.dumps(tags) if tags else None
+            "tags": json.dumps(tags) if tags else None,
+            "summary": summarize_creation(user_prompt, enhanced_prompt)
         }
+        creation_data["content_hash"] = content_hash(creation_data)
         
-        # Store in session memory
-        session_id = str(int(time.time()))
-        self.session_memory[session_id] = creation_data
+        return creation_data
+    
+    def _remember(self, 
+                  creation_id: int, 
+                  creation_data: Dict[str, Any], 
+                  metadata: Optional[Dict[str, Any]], 
+                  tags: Optional[List[str]],
+                  embedding: Optional[List[float]] = None):
+        """
+        Put a stored creation into session memory, in the form get_creation_by_id
+        returns, and its embedding into the similarity index. Cached memory
+        contexts are outdated by the new creation.
+        """
+        if creation_id < 0:
+            return
+        self.session_memory.put(creation_id, Creation(**{
+            "id": creation_id,
+            **creation_data,
+            "metadata": metadata or None,
+            "tags": tags or None
+        }))
+        if embedding is not None and self.vectors is not None:
+            self.vectors.add(creation_id, embedding)
+        bump_generation(self.pool)
+    
+    def _get_creations(self, creation_ids: List[int]) -> List[Creation]:
+        """
+        Get creations by ID, reading through session memory.
         
-        try:
-            # Store in long-term memory (SQLite)
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            INSERT INTO creations 
-            (timestamp, user_prompt, enhanced_prompt, image_path, model_path, metadata, tags)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                timestamp,
-                user_prompt,
-                enhanced_prompt,
-                image_path,
-                model_path,
-                creation_data["metadata"],
-                creation_data["tags"]
-            ))
-            
-            creation_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            
-            logging.info(f"Creation stored with ID: {creation_id}")
-            return creation_id
+        Only creations missing from session memory are loaded from the database
+        and parsed; they are then kept in session memory for the next read.
+        Session memory is shared by all tenants of the database, so creations of
+        other tenants are dropped here.
+        
+        Args:
+            creation_ids: IDs of the creations to get
             
-        except Exception as e:
-            logging.error(f"Error storing creation in long-term memory: {str(e)}")
-            return -1
+        Returns:
+            List of creations in the order of creation_ids, skipping unknown IDs
+        """
+        found = {}
+        missing = []
+        for creation_id in creation_ids:
+            creation = self.session_memory.get(creation_id)
+            if creation is None:
+                missing.append(creation_id)
+            else:
+                found[creation_id] = creation
+        
+        if missing:
+            cursor = self.pool.connection().cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(SELECT_BY_IDS_SQL.format(placeholders=", ".join("?" * len(missing))), missing)
+            for row in cursor.fetchall():
+                creation = Creation.from_row(row)
+                self.session_memory.put(creation["id"], creation)
+                found[creation["id"]] = creation
+        
+        tenant_id = self._tenant_filter()
+        if tenant_id is not None:
+            found = {creation_id: creation for creation_id, creation in found.items()
+                     if creation["tenant_id"] == tenant_id}
+        
+        # Copies, so callers changing a result do not change session memory
+        return [found[creation_id].copy() for creation_id in creation_ids if creation_id in found]
+    
+    def session_stats(self) -> Dict[str, Any]:
+        """
+        Get session memory statistics.
+        
+        Returns:
+            Dict with size, max_size, hits, misses and hit_rate
+        """
+        return self.session_memory.stats()
     
-    def get_creation_by_id(self, creation_id: int) -> Optional[Dict[str, Any]]:
+    def get_creation_by_id(self, creation_id: int) -> Optional[Creation]:
         """
         Retrieve a creation by its ID from long-term memory.
         
@@ -137,79 +903,72 @@ class MemoryManager:
             creation_id: The ID of the creation to retrieve
             
         Returns:
-            Dict containing the creation data, or None if not found
+            The creation, or None if not found
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            SELECT * FROM creations WHERE id = ?
-            ''', (creation_id,))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                column_names = [description[0] for description in cursor.description]
-                creation = dict(zip(column_names, row))
-                
-                # Parse JSON fields
-                if creation["metadata"]:
-                    creation["metadata"] = json.loads(creation["metadata"])
-                if creation["tags"]:
-                    creation["tags"] = json.loads(creation["tags"])
-                    
-                return creation
-            return None
+            creations = self._get_creations([creation_id])
+            return creations[0] if creations else None
             
         except Exception as e:
             logging.error(f"Error retrieving creation {creation_id}: {str(e)}")
             return None
     
-    def search_creations(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_creations(self, 
+                         query: str, 
+                         limit: int = 5, 
+                         recency_weight: float = 0.0,
+                         tags_any: Optional[List[str]] = None,
+                         tags_all: Optional[List[str]] = None,
+                         fields: Optional[Sequence[str]] = None) -> List[Creation]:
         """
         Search for creations by keyword in prompts or tags.
         
+        Uses the full-text index ranked by BM25 relevance when available, matching
+        every word of the query by prefix, except stopwords and words of one or two
+        letters. Otherwise falls back to a substring scan
+        ordered by recency. Tag filters match whole tags (case-insensitive) through
+        the tags table; with an empty query they alone select the creations.
+        
         Args:
-            query: Search term
+            query: Search term, may be empty when filtering by tags
             limit: Maximum number of results to return
+            recency_weight: How strongly to favour recent creations over relevance (0 disables)
+            tags_any: Only return creations having at least one of these tags
+            tags_all: Only return creations having all of these tags
+            fields: Creation fields to load, or None for all of them
             
         Returns:
-            List of matching creation dictionaries
+            List of matching creations, best match first
         """
+        columns = select_columns(fields)
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Return results as dictionaries
-            cursor = conn.cursor()
-            
-            # Search in user_prompt, enhanced_prompt, and tags
-            cursor.execute('''
-            SELECT * FROM creations 
-            WHERE user_prompt LIKE ? OR enhanced_prompt LIKE ? OR tags LIKE ?
-            ORDER BY timestamp DESC LIMIT ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%', limit))
+            cursor = self.pool.connection().cursor()
+            cursor.row_factory = sqlite3.Row
             
+            filters, filter_params = build_tag_filters(tags_any, tags_all, self._tenant_filter())
+            match_query = build_match_query(query, self._tenant_filter()) if self.fts_enabled else None
+            if match_query:
+                cursor.execute(FTS_SEARCH_SQL.format(columns=columns, filters=filters),
+                               (match_query, *filter_params, recency_weight, time.time() * 1000, limit))
+            elif filters and not query.strip():
+                cursor.execute(FILTER_SQL.format(columns=columns, filters=filters), (*filter_params, limit))
+            elif self.fts_enabled and query.strip():
+                # Only stopwords and short words, which would match nearly everything
+                return []
+            else:
+                # Search in user_prompt, enhanced_prompt, and tags
+                cursor.execute(SEARCH_SQL.format(columns=columns, filters=filters),
+                               (f'%{query}%', f'%{query}%', f'%{query}%', *filter_params, limit))
             results = cursor.fetchall()
-            conn.close()
             
-            # Convert Row objects to dictionaries and parse JSON fields
-            creations = []
-            for row in results:
-                creation = dict(row)
-                if creation["metadata"]:
-                    creation["metadata"] = json.loads(creation["metadata"])
-                if creation["tags"]:
-                    creation["tags"] = json.loads(creation["tags"])
-                creations.append(creation)
-                
-            return creations
+            # JSON fields are only decoded if read
+            return [Creation.from_row(row) for row in results]
             
         except Exception as e:
             logging.error(f"Error searching creations: {str(e)}")
             return []
     
-    def get_recent_creations(self, limit: int = 5) -> List[Dict[str, Any]]:
+    def get_recent_creations(self, limit: int = 5) -> List[Creation]:
         """
         Get the most recent creations.
         
@@ -217,59 +976,166 @@ class MemoryManager:
             limit: Maximum number of results to return
             
         Returns:
-            List of recent creation dictionaries
+            List of recent creations
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            # IDs come from the recency index; the creations themselves mostly from session memory
+            filters, filter_params = build_tag_filters(tenant_id=self._tenant_filter())
+            cursor = self.pool.connection().execute(RECENT_IDS_SQL.format(filters=filters), (*filter_params, limit))
+            creation_ids = [row[0] for row in cursor.fetchall()]
+            return self._get_creations(creation_ids)
             
-            cursor.execute('''
-            SELECT * FROM creations ORDER BY timestamp DESC LIMIT ?
-            ''', (limit,))
+        except Exception as e:
+            logging.error(f"Error retrieving recent creations: {str(e)}")
+            return []
+    
+    def _get_recent_summaries(self, limit: int) -> List[Creation]:
+        """Get the prompts and summaries of the most recent creations from the covering index."""
+        try:
+            cursor = self.pool.connection().cursor()
+            cursor.row_factory = sqlite3.Row
+            filters, filter_params = build_tag_filters(tenant_id=self._tenant_filter())
+            cursor.execute(RECENT_CONTEXT_SQL.format(filters=filters), (*filter_params, limit))
+            return [Creation.from_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"Error retrieving recent summaries: {str(e)}")
+            return []
+    
+    def iter_creations(self, 
+                       chunk_size: int = 500, 
+                       newest_first: bool = True,
+                       after: Optional[Tuple[int, int]] = None,
+                       tags_any: Optional[List[str]] = None,
+                       tags_all: Optional[List[str]] = None) -> Iterator[Creation]:
+        """
+        Stream all creations in recency order, one chunk of rows at a time.
+        
+        Pages are read with keyset pagination on (created_at, id): every chunk is
+        a separate index range query starting after the last row of the previous
+        one. Memory use therefore stays constant, each page costs the same however
+        deep into the history it is, and no read transaction is held open between
+        chunks. Rows bypass session memory, so a full scan does not evict it.
+        
+        Args:
+            chunk_size: Number of rows fetched per query
+            newest_first: Iterate from the newest creation backwards, otherwise from the oldest
+            after: (created_at, id) of the last creation already processed, to resume from
+            tags_any: Only yield creations having at least one of these tags
+            tags_all: Only yield creations having all of these tags
             
-            results = cursor.fetchall()
-            conn.close()
+        Yields:
+            Creations; resume later by passing the last one's (created_at, id) as after
+        """
+        sql = PAGE_NEWEST_FIRST_SQL if newest_first else PAGE_OLDEST_FIRST_SQL
+        filters, filter_params = build_tag_filters(tags_any, tags_all, self._tenant_filter())
+        sql = sql.format(filters=filters)
+        key = after or (_MAX_KEY if newest_first else _MIN_KEY)
+        
+        while True:
+            cursor = self.pool.connection().cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(sql, (*key, *filter_params, chunk_size))
+            rows = cursor.fetchall()
             
-            # Convert Row objects to dictionaries and parse JSON fields
-            creations = []
-            for row in results:
-                creation = dict(row)
-                if creation["metadata"]:
-                    creation["metadata"] = json.loads(creation["metadata"])
-                if creation["tags"]:
-                    creation["tags"] = json.loads(creation["tags"])
-                creations.append(creation)
-                
-            return creations
+            for row in rows:
+                yield Creation.from_row(row)
+            if len(rows) < chunk_size:
+                return
+            key = (rows[-1]["created_at"], rows[-1]["id"])
+    
+    def search_similar(self, query: str, limit: int = 5, min_similarity: float = 0.0) -> List[Creation]:
+        """
+        Find creations whose meaning is closest to a query, even without shared words.
+        
+        Args:
+            query: Free-text description
+            limit: Maximum number of results to return
+            min_similarity: Minimum cosine similarity of returned creations
             
+        Returns:
+            List of creations with their "similarity", most similar first;
+            empty if similarity search is disabled
+        """
+        if self.vectors is None:
+            return []
+        embedding = self._embed(query)
+        if embedding is None:
+            return []
+        
+        try:
+            matches = [(creation_id, similarity) for creation_id, similarity in self.vectors.search(embedding, limit)
+                       if similarity >= min_similarity]
+            similarities = dict(matches)
+            creations = self._get_creations([creation_id for creation_id, _ in matches])
+            for creation in creations:
+                creation["similarity"] = similarities[creation["id"]]
+            return creations
         except Exception as e:
-            logging.error(f"Error retrieving recent creations: {str(e)}")
+            logging.error(f"Error searching similar creations: {str(e)}")
             return []
     
-    def get_memory_context(self, query: Optional[str] = None, limit: int = 3) -> str:
+    def get_tag_counts(self, limit: int = 20) -> Dict[str, int]:
+        """
+        Get the most used tags with their number of creations.
+        
+        Args:
+            limit: Maximum number of tags to return
+            
+        Returns:
+            Dict of tag to creation count, most used first
+        """
+        try:
+            tenant_id = self._tenant_filter()
+            filters, filter_params = (" AND tenant_id = ?", [tenant_id]) if tenant_id is not None else ("", [])
+            rows = self.pool.connection().execute(TAG_COUNTS_SQL.format(filters=filters),
+                                                  (*filter_params, limit)).fetchall()
+            return dict(rows)
+        except Exception as e:
+            logging.error(f"Error counting tags: {str(e)}")
+            return {}
+    
+    def get_memory_context(self, query: Optional[str] = None, limit: int = 3, max_chars: int = 1200) -> str:
         """
         Get a formatted context string from memory to use in prompt enhancement.
         
+        The context uses the compact summaries stored with each creation and is
+        kept within max_chars, so it does not inflate the LLM prompt. With an
+        embedder, creations similar in meaning to the query are included as well
+        as keyword matches. Repeated requests are answered from the context cache
+        until a creation is stored or deleted.
+        
         Args:
             query: Optional search term to find relevant past creations
             limit: Maximum number of past creations to include
+            max_chars: Maximum length of the context string
             
         Returns:
             String containing formatted context from memory
         """
-        creations = []
+        key = (memory_generation(self.pool), self.tenant_id, query, limit, max_chars, self.vectors is not None)
+        context = self.context_cache.get(key)
+        if context is not None:
+            return context
+        
+        context = self._build_memory_context(query, limit, max_chars)
+        self.context_cache.put(key, context)
+        return context
+    
+    def _build_memory_context(self, query: Optional[str], limit: int, max_chars: int) -> str:
+        """Build the memory context string from the database, see get_memory_context."""
+        # Fetch extra candidates so duplicates can be skipped and the most relevant kept
+        candidates = limit * 3
         
         if query:
-            creations = self.search_creations(query, limit)
+            # Similar creations first, then keyword matches they did not already cover
+            creations = self.search_similar(query, candidates)
+            seen = {creation["id"] for creation in creations}
+            creations += [creation for creation in self.search_creations(query, candidates, fields=CONTEXT_FIELDS)
+                          if creation["id"] not in seen]
         else:
-            creations = self.get_recent_creations(limit)
+            creations = self._get_recent_summaries(candidates)
             
         if not creations:
             return ""
             
-        context_parts = []
-        for creation in creations:
-            context_parts.append(f"Previous creation: '{creation['user_prompt']}' - Enhanced as: '{creation['enhanced_prompt']}'")
-            
-        return "\n".join(context_parts) 
\ No newline at end of file
+        return build_context(creations, query=query, limit=limit, max_chars=max_chars)
@@ -0,0 +1,406 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from core.memory.connection_pool import ConnectionPool, get_pool
+from core.memory.memory_manager import bump_generation, get_session_cache, vector_index_path_for
+from core.memory.vector_index import get_vector_index, numpy_available
+from core.utils.metrics import metrics
+
+ARCHIVE_SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS archived_creations (
+    id INTEGER PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    created_at INTEGER,
+    archived_at INTEGER NOT NULL,
+    data BLOB NOT NULL
+)
+'''
+# Replacing keeps archiving idempotent if a batch is archived again after an interrupted delete
+INSERT_ARCHIVE_SQL = '''
+INSERT OR REPLACE INTO archived_creations (id, tenant_id, created_at, archived_at, data)
+VALUES (?, ?, ?, ?, ?)
+'''
+SELECT_ARCHIVE_SQL = 'SELECT data FROM archived_creations WHERE 1{filters} ORDER BY created_at, id'
+
+# Expired rows are always taken from the old end of a recency index, a batch at a time
+EXPIRED_BY_AGE_SQL = 'SELECT * FROM creations WHERE created_at < ? ORDER BY created_at, id LIMIT ?'
+TENANTS_SQL = 'SELECT DISTINCT tenant_id FROM creations'
+EXPIRED_BY_COUNT_SQL = '''
+SELECT * FROM creations WHERE tenant_id = ?
+ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+OLDEST_SQL = 'SELECT * FROM creations ORDER BY created_at, id LIMIT ?'
+DELETE_CREATION_SQL = 'DELETE FROM creations WHERE id = ?'
+
+_jobs: Dict[str, "RetentionJob"] = {}
+_jobs_lock = threading.Lock()
+
+
+class RetentionPolicy:
+    """
+    Limits on how much history memory keeps.
+
+    A creation expires when any limit applies to it; unset limits are ignored.
+    """
+
+    def __init__(self,
+                 max_age_days: Optional[float] = None,
+                 max_per_tenant: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            max_age_days: Expire creations older than this many days
+            max_per_tenant: Keep only this many of each tenant's newest creations
+            max_bytes: Expire the oldest creations while the database and artifacts use more bytes than this
+        """
+        self.max_age_days = max_age_days
+        self.max_per_tenant = max_per_tenant
+        self.max_bytes = max_bytes
+
+    def __repr__(self) -> str:
+        return (f"RetentionPolicy(max_age_days={self.max_age_days!r}, "
+                f"max_per_tenant={self.max_per_tenant!r}, max_bytes={self.max_bytes!r})")
+
+
+class RetentionJob:
+    """
+    Background job enforcing a retention policy on the memory database.
+
+    Expired creations are moved, zlib-compressed, into an archive database and
+    deleted from memory together with their image and model files. Deleting a
+    creation removes its tags and full-text entries through triggers; the job
+    also drops it from session memory and from its tenant's embedding index,
+    and outdates cached memory contexts.
+    Afterwards freed pages are returned to the OS with incremental vacuum and
+    the query planner statistics are refreshed with PRAGMA optimize.
+
+    Work is done in small batches, each its own short transaction, with a pause
+    in between, so requests are never blocked for long while the job runs.
+    """
+
+    def __init__(self,
+                 db_path: str = "datastore/memory.db",
+                 policy: Optional[RetentionPolicy] = None,
+                 archive_path: Optional[str] = None,
+                 artifact_dirs: Optional[Sequence[str]] = None,
+                 batch_size: int = 200,
+                 pause: float = 0.05,
+                 vacuum_pages: int = 1024,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initialize the job.
+
+        Args:
+            db_path: Path to the memory database
+            policy: Limits to enforce, defaults to keeping everything
+            archive_path: Path of the archive database, defaults to one next to the memory database
+            artifact_dirs: Directories whose files may be deleted with their creations,
+                defaults to the images and models directories next to the database
+            batch_size: Creations expired per transaction
+            pause: Seconds to wait between batches
+            vacuum_pages: Pages freed per incremental vacuum step
+            on_progress: Called with the progress after every batch
+        """
+        base_dir = os.path.dirname(db_path)
+        self.db_path = db_path
+        self.policy = policy or RetentionPolicy()
+        self.archive_path = archive_path or f"{os.path.splitext(db_path)[0]}_archive.db"
+        self.artifact_dirs = [os.path.abspath(path) for path in
+                              (artifact_dirs or [os.path.join(base_dir, "images"), os.path.join(base_dir, "models")])]
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.on_progress = on_progress
+        self._progress: Dict[str, Any] = {"state": "idle"}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self, interval: Optional[float] = None) -> "RetentionJob":
+        """
+        Run the job on a background thread.
+
+        Args:
+            interval: Seconds between runs, or None to run once
+
+        Returns:
+            RetentionJob: This job
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_every, args=(interval,),
+                                            name="memory-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the job after its current batch.
+
+        Args:
+            timeout: Maximum seconds to wait for the job thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a job started without an interval to finish.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            bool: True if the job is no longer running
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._thread is None or not self._thread.is_alive()
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get the progress of the current or last run.
+
+        Returns:
+            Dict with the state and phase, the number of archived creations, deleted
+            files, bytes freed by deleting them, and pages returned by vacuuming
+        """
+        with self._lock:
+            return dict(self._progress)
+
+    def _run_every(self, interval: Optional[float]):
+        """Job thread: run now, then every interval seconds until stopped."""
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logging.error(f"Error enforcing memory retention: {str(e)}")
+                self._update(state="failed", error=str(e))
+            if interval is None or self._stop.wait(interval):
+                return
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Enforce the policy once on the calling thread.
+
+        Returns:
+            Dict: The final progress
+        """
+        with self._lock:
+            self._progress = {"state": "running", "phase": None, "archived": 0, "files_deleted": 0,
+                              "bytes_freed": 0, "pages_vacuumed": 0, "started_at": time.time()}
+        pool = get_pool(self.db_path)
+        archive = sqlite3.connect(self.archive_path)
+        try:
+            archive.execute(ARCHIVE_SCHEMA_SQL)
+            policy = self.policy
+
+            if policy.max_age_days is not None:
+                self._update(phase="age")
+                cutoff = int((time.time() - policy.max_age_days * 86400) * 1000)
+                self._expire_while(pool, archive, lambda cursor: cursor.execute(
+                    EXPIRED_BY_AGE_SQL, (cutoff, self.batch_size)).fetchall())
+
+            if policy.max_per_tenant is not None:
+                self._update(phase="count")
+                for (tenant_id,) in pool.connection().execute(TENANTS_SQL).fetchall():
+                    # Deleting a batch moves the next expired rows to the same offset
+                    self._expire_while(pool, archive, lambda cursor: cursor.execute(
+                        EXPIRED_BY_COUNT_SQL, (tenant_id, self.batch_size, policy.max_per_tenant)).fetchall())
+
+            if policy.max_bytes is not None:
+                self._update(phase="size")
+                # Artifact directories are listed once; files deleted since are subtracted from that total
+                artifact_bytes = self._artifact_bytes() + self.progress()["bytes_freed"]
+
+                def oldest_while_too_large(cursor):
+                    used = self._used_db_bytes(cursor) + artifact_bytes - self.progress()["bytes_freed"]
+                    if used <= policy.max_bytes:
+                        return []
+                    return cursor.execute(OLDEST_SQL, (self.batch_size,)).fetchall()
+
+                self._expire_while(pool, archive, oldest_while_too_large)
+
+            self._update(phase="compact")
+            self._compact(pool.connection())
+        finally:
+            archive.close()
+            pool.release()
+
+        self._update(state="stopped" if self._stop.is_set() else "done", finished_at=time.time())
+        progress = self.progress()
+        logging.info(f"Memory retention finished: {progress['archived']} creations archived, "
+                     f"{progress['files_deleted']} files deleted")
+        return progress
+
+    def _expire_while(self,
+                      pool: ConnectionPool,
+                      archive: sqlite3.Connection,
+                      select_batch: Callable[[sqlite3.Cursor], List[sqlite3.Row]]):
+        """Expire batches selected by select_batch until it returns none or the job is stopped."""
+        while not self._stop.is_set():
+            cursor = pool.connection().cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = select_batch(cursor)
+            if not rows:
+                return
+            self._expire(pool, archive, rows)
+            self._stop.wait(self.pause)
+
+    def _expire(self, pool: ConnectionPool, archive: sqlite3.Connection, rows: List[sqlite3.Row]):
+        """Archive a batch of creations, then delete them and everything derived from them."""
+        archived_at = int(time.time() * 1000)
+        # The archive is committed first, so an interrupted batch is archived twice rather than lost
+        with archive:
+            archive.executemany(INSERT_ARCHIVE_SQL, [
+                (row["id"], row["tenant_id"], row["created_at"], archived_at,
+                 zlib.compress(json.dumps(dict(row)).encode("utf-8")))
+                for row in rows
+            ])
+        conn = pool.connection()
+        with conn:
+            conn.executemany(DELETE_CREATION_SQL, [(row["id"],) for row in rows])
+
+        session_memory = get_session_cache(pool)
+        by_tenant: Dict[str, List[int]] = {}
+        for row in rows:
+            session_memory.pop(row["id"])
+            by_tenant.setdefault(row["tenant_id"], []).append(row["id"])
+        if numpy_available():
+            for tenant_id, creation_ids in by_tenant.items():
+                path = vector_index_path_for(self.db_path, tenant_id)
+                if os.path.exists(f"{path}.json"):
+                    get_vector_index(path).remove(creation_ids)
+        bump_generation(pool)
+
+        files_deleted, bytes_freed = 0, 0
+        for row in rows:
+            for path in (row["image_path"], row["model_path"]):
+                size = self._delete_artifact(path)
+                if size is not None:
+                    files_deleted += 1
+                    bytes_freed += size
+
+        metrics.increment("memory.retention.archived", len(rows))
+        progress = self.progress()
+        self._update(archived=progress["archived"] + len(rows),
+                     files_deleted=progress["files_deleted"] + files_deleted,
+                     bytes_freed=progress["bytes_freed"] + bytes_freed)
+
+    def _delete_artifact(self, path: Optional[str]) -> Optional[int]:
+        """Delete an artifact file inside the artifact directories, returning its size if it was deleted."""
+        if not path:
+            return None
+        path = os.path.abspath(path)
+        if not any(os.path.dirname(path) == directory for directory in self.artifact_dirs):
+            return None
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.error(f"Error deleting expired artifact {path}: {str(e)}")
+            return None
+
+    def _artifact_bytes(self) -> int:
+        """Total size of the files in the artifact directories."""
+        total = 0
+        for directory in self.artifact_dirs:
+            if os.path.isdir(directory):
+                with os.scandir(directory) as entries:
+                    total += sum(entry.stat().st_size for entry in entries if entry.is_file())
+        return total
+
+    @staticmethod
+    def _used_db_bytes(cursor: sqlite3.Cursor) -> int:
+        """Bytes of the database's pages holding data, excluding free pages awaiting vacuum."""
+        page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def _compact(self, conn: sqlite3.Connection):
+        """Return free pages to the OS a step at a time and refresh planner statistics."""
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            while not self._stop.is_set():
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if free == 0:
+                    break
+                # Each step frees pages while the statement is stepped, so its rows must be consumed
+                conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+                self._update(pages_vacuumed=self.progress()["pages_vacuumed"] + min(free, self.vacuum_pages))
+                self._stop.wait(self.pause)
+        else:
+            logging.info("Memory database predates incremental vacuum; freed pages are reused "
+                         "but the file only shrinks after a full VACUUM")
+        conn.execute('PRAGMA optimize')
+
+    def _update(self, **changes: Any):
+        """Update the progress and report it."""
+        with self._lock:
+            self._progress.update(changes)
+            progress = dict(self._progress)
+        if self.on_progress is not None:
+            try:
+                self.on_progress(progress)
+            except Exception as e:
+                logging.error(f"Error reporting retention progress: {str(e)}")
+
+
+def iter_archived(archive_path: str, tenant_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Read archived creations back, oldest first.
+
+    Args:
+        archive_path: Path of the archive database
+        tenant_id: Only read creations of this tenant, or None for all
+
+    Yields:
+        Archived creation rows as dictionaries, JSON columns still encoded
+    """
+    conn = sqlite3.connect(archive_path)
+    try:
+        filters, params = (" AND tenant_id = ?", (tenant_id,)) if tenant_id is not None else ("", ())
+        for (data,) in conn.execute(SELECT_ARCHIVE_SQL.format(filters=filters), params):
+            yield json.loads(zlib.decompress(data))
+    finally:
+        conn.close()
+
+
+def start_retention_job(db_path: str,
+                        policy: RetentionPolicy,
+                        interval: Optional[float] = 3600,
+                        **kwargs) -> RetentionJob:
+    """
+    Start the background retention job of a database, unless one is already running.
+
+    Args:
+        db_path: Path to the memory database
+        policy: Limits to enforce
+        interval: Seconds between runs, or None to run once
+        **kwargs: RetentionJob options, used when the job is started
+
+    Returns:
+        RetentionJob: The running job for that database
+    """
+    key = os.path.abspath(db_path)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and not job.wait(0):
+            return job
+        job = RetentionJob(db_path, policy, **kwargs)
+        _jobs[key] = job
+    return job.start(interval)
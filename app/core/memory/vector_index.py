@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_indexes: Dict[str, "VectorIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def numpy_available() -> bool:
+    """Whether NumPy is installed, which the vector index requires."""
+    return np is not None
+
+
+class VectorIndex:
+    """
+    Persistent embedding index with top-k cosine similarity search.
+
+    Vectors are L2-normalized and stored row by row in a memory-mapped .npy
+    matrix next to an array of their creation IDs, so the index survives
+    restarts and is paged in by the OS instead of being read into memory.
+    Search is a single matrix-vector product over all rows. Above ivf_threshold
+    rows, an IVF coarse quantizer (k-means centroids, each with an inverted list
+    of its rows) limits the search to the nprobe lists closest to the query.
+    """
+
+    def __init__(self,
+                 path: str,
+                 ivf_threshold: int = 100_000,
+                 nlist: Optional[int] = None,
+                 nprobe: int = 8,
+                 initial_capacity: int = 1024):
+        """
+        Initialize the index, loading it from disk if it exists.
+
+        Args:
+            path: Path prefix of the index files (.npy, .ids.npy and .json are appended)
+            ivf_threshold: Row count from which the coarse quantizer is trained and used
+            nlist: Number of IVF lists, defaults to the square root of the row count
+            nprobe: Number of IVF lists searched per query
+            initial_capacity: Rows allocated when the index is created; capacity doubles when full
+        """
+        if np is None:
+            raise ImportError("NumPy is required for the vector index")
+
+        self.path = path
+        self.vectors_path = f"{path}.npy"
+        self.ids_path = f"{path}.ids.npy"
+        self.meta_path = f"{path}.json"
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.initial_capacity = initial_capacity
+        self.dim: Optional[int] = None
+        self.count = 0
+        self._vectors = None
+        self._ids = None
+        self._centroids = None
+        self._lists: List["np.ndarray"] = []
+        self._trained_count = 0
+        self._training: Optional[threading.Thread] = None
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Open existing index files."""
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self._ids = np.load(self.ids_path, mmap_mode="r+")
+        logging.info(f"Loaded vector index with {self.count} vectors from {self.path}")
+        self._maybe_train()
+
+    def _write_meta(self):
+        with open(self.meta_path, "w") as f:
+            json.dump({"dim": self.dim, "count": self.count}, f)
+
+    def _allocate(self, capacity: int):
+        """Move the stored rows into files with room for capacity rows."""
+        vectors = np.lib.format.open_memmap(f"{self.vectors_path}.tmp", mode="w+",
+                                            dtype=np.float32, shape=(capacity, self.dim))
+        ids = np.lib.format.open_memmap(f"{self.ids_path}.tmp", mode="w+", dtype=np.int64, shape=(capacity,))
+        if self.count:
+            vectors[:self.count] = self._vectors[:self.count]
+            ids[:self.count] = self._ids[:self.count]
+        vectors.flush()
+        ids.flush()
+        os.replace(f"{self.vectors_path}.tmp", self.vectors_path)
+        os.replace(f"{self.ids_path}.tmp", self.ids_path)
+        self._vectors, self._ids = vectors, ids
+
+    def add(self, creation_id: int, vector: Sequence[float]) -> bool:
+        """
+        Add the embedding of a creation.
+
+        Args:
+            creation_id: ID of the creation
+            vector: Its embedding
+
+        Returns:
+            bool: True if added, False if the vector is empty or has the wrong dimension
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or norm == 0.0:
+            return False
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = len(vector)
+                self._allocate(self.initial_capacity)
+            elif len(vector) != self.dim:
+                logging.warning(f"Ignoring embedding of dimension {len(vector)}, the index uses {self.dim}")
+                return False
+            if self.count == len(self._ids):
+                self._allocate(2 * len(self._ids))
+
+            row = self.count
+            self._vectors[row] = vector / norm
+            self._ids[row] = creation_id
+            if self._centroids is not None:
+                self._assign(row, row + 1)
+            self.count += 1
+            self._write_meta()
+
+        self._maybe_train()
+        return True
+
+    def remove(self, creation_ids: Sequence[int]) -> int:
+        """
+        Remove the embeddings of creations.
+
+        Rows are tombstoned in place (ID -1, zero vector) rather than moved, so
+        the inverted lists of the quantizer stay valid; search skips them.
+
+        Args:
+            creation_ids: IDs of the creations to remove
+
+        Returns:
+            int: Number of embeddings removed
+        """
+        with self._lock:
+            if self.count == 0 or not len(creation_ids):
+                return 0
+            rows = np.flatnonzero(np.isin(self._ids[:self.count], np.asarray(creation_ids, dtype=np.int64)))
+            self._ids[rows] = -1
+            self._vectors[rows] = 0.0
+        return len(rows)
+
+    def search(self, vector: Sequence[float], k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Find the stored embeddings most similar to a query embedding.
+
+        Args:
+            vector: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (creation ID, cosine similarity) tuples, most similar first
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        with self._lock:
+            if self.count == 0 or norm == 0.0 or len(query) != self.dim:
+                return []
+            count, vectors, ids = self.count, self._vectors, self._ids
+            centroids, lists = self._centroids, list(self._lists)
+        query = query / norm
+
+        if centroids is not None:
+            nprobe = min(self.nprobe, len(centroids))
+            probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.concatenate([lists[c] for c in probe])
+            scores = vectors[rows] @ query
+            scores[ids[rows] < 0] = -np.inf
+        else:
+            rows = None
+            scores = vectors[:count] @ query
+            scores[ids[:count] < 0] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = rows[top] if rows is not None else top
+        return [(int(ids[row]), float(score)) for row, score in zip(rows, scores[top]) if ids[row] >= 0]
+
+    def train(self) -> None:
+        """Train the coarse quantizer on the current rows and build its inverted lists."""
+        with self._lock:
+            count, vectors = self.count, self._vectors
+        if count == 0:
+            return
+
+        nlist = min(self.nlist or int(np.sqrt(count)), count)
+        rng = np.random.default_rng(0)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, size=min(count, nlist * 64), replace=False))])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+
+        with self._lock:
+            self._centroids = centroids
+            self._lists = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+            self._assign(0, self.count)
+            self._trained_count = self.count
+        logging.info(f"Trained vector index quantizer with {nlist} lists on {count} vectors")
+
+    def _assign(self, start: int, end: int, chunk: int = 65536):
+        """Add rows start to end to the inverted list of their closest centroid."""
+        for chunk_start in range(start, end, chunk):
+            chunk_end = min(chunk_start + chunk, end)
+            assignment = np.argmax(self._vectors[chunk_start:chunk_end] @ self._centroids.T, axis=1)
+            rows = np.arange(chunk_start, chunk_end, dtype=np.int64)
+            for centroid in np.unique(assignment):
+                self._lists[centroid] = np.concatenate([self._lists[centroid], rows[assignment == centroid]])
+
+    def _maybe_train(self):
+        """Train the quantizer in the background once the index outgrows brute-force search."""
+        with self._lock:
+            if (self.count < self.ivf_threshold or self.count < 2 * self._trained_count
+                    or (self._training is not None and self._training.is_alive())):
+                return
+            self._training = threading.Thread(target=self.train, name="vector-index-train", daemon=True)
+            self._training.start()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get index statistics.
+
+        Returns:
+            Dict with the number of vectors, removed ones, their dimension and the number of IVF lists
+        """
+        with self._lock:
+            return {
+                "count": self.count,
+                "removed": int(np.count_nonzero(self._ids[:self.count] < 0)) if self.count else 0,
+                "dim": self.dim,
+                "ivf_lists": len(self._lists) if self._centroids is not None else 0
+            }
+
+    def flush(self) -> None:
+        """Write the memory-mapped rows to disk."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()
+                self._write_meta()
+
+
+def get_vector_index(path: str, **kwargs) -> VectorIndex:
+    """
+    Get the shared vector index stored at a path, opening it if needed.
+
+    Args:
+        path: Path prefix of the index files
+        **kwargs: VectorIndex options, used when the index is opened
+
+    Returns:
+        VectorIndex: The index for that path
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or (index.count and not os.path.exists(index.meta_path)):
+            index = VectorIndex(path, **kwargs)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,245 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.memory.connection_pool import ConnectionPool
+from core.utils.metrics import metrics
+
+# Writes a batch inside an open transaction and returns one result per item
+BatchWriter = Callable[[sqlite3.Connection, List[Any]], List[Any]]
+
+_STOP = object()
+_FLUSH = object()
+
+_writers: Dict[str, "WriteBehindWriter"] = {}
+_writers_lock = threading.Lock()
+
+
+class WriteBehindWriter:
+    """
+    Background writer that groups queued writes into shared transactions.
+
+    Callers enqueue items and immediately get a future. A dedicated thread takes
+    up to batch_size items, or whatever arrived within flush_interval of the
+    first one, and writes them in a single transaction, so many writes share one
+    commit instead of paying for one each. The queue is bounded: when the writer
+    falls behind, callers block until there is room again.
+    """
+
+    def __init__(self,
+                 pool: ConnectionPool,
+                 write_batch: BatchWriter,
+                 batch_size: int = 64,
+                 flush_interval: float = 0.05,
+                 max_queue: int = 1024):
+        """
+        Initialize and start the writer.
+
+        Args:
+            pool: Connection pool of the database to write to
+            write_batch: Function writing a batch of items on a connection
+            batch_size: Maximum number of items per transaction
+            flush_interval: Seconds to wait for more items before writing a batch
+            max_queue: Maximum number of items waiting to be written
+        """
+        self.pool = pool
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.closed = False
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for writing.
+
+        Args:
+            item: Item passed to write_batch
+
+        Returns:
+            Future: Resolves to the item's result once its transaction has committed
+        """
+        future = Future()
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("Write-behind writer is closed")
+            self._queue.put((item, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been written.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            bool: True if the queue was flushed within the timeout
+        """
+        future = Future()
+        with self._lock:
+            if self.closed:
+                return not self._thread.is_alive()
+            self._queue.put((_FLUSH, future))
+        try:
+            future.result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Write everything still queued, checkpoint it into the database file and stop.
+
+        Args:
+            timeout: Maximum seconds to wait for the writer thread
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._queue.put((_STOP, Future()))
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get writer statistics.
+
+        Returns:
+            Dict with queued items, written items and batches, and the mean batch size
+        """
+        return {
+            "queued": self._queue.qsize(),
+            "items": self.items,
+            "batches": self.batches,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0
+        }
+
+    def _run(self):
+        """Writer thread: collect batches from the queue and write them."""
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            writes = [(item, future) for item, future in batch if item is not _FLUSH and item is not _STOP]
+            if writes:
+                self._write(writes)
+            for item, future in batch:
+                if item is _FLUSH:
+                    future.set_result(True)
+                elif item is _STOP:
+                    stopping = True
+
+        self._checkpoint()
+
+    def _write(self, writes: List[Tuple[Any, Future]]):
+        """
+        Write a batch in one transaction and resolve its futures.
+
+        If the batch fails, its items are written again one transaction each,
+        so only the futures of items that fail on their own get the error.
+        """
+        try:
+            results = self._commit([item for item, _ in writes])
+        except Exception as e:
+            logging.error(f"Error writing batch of {len(writes)} queued items: {str(e)}")
+            if len(writes) == 1:
+                writes[0][1].set_exception(e)
+                return
+            for write in writes:
+                self._write([write])
+            return
+
+        self.batches += 1
+        self.items += len(writes)
+        metrics.observe("memory.write_batch_size", len(writes))
+        for (_, future), result in zip(writes, results):
+            future.set_result(result)
+
+    def _commit(self, items: List[Any]) -> List[Any]:
+        """Write items in one transaction, rolling it back if anything fails."""
+        conn = self.pool.connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            results = self.write_batch(conn, items)
+            conn.commit()
+            return results
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def _checkpoint(self):
+        """Copy committed writes from the WAL into the database file and sync it."""
+        try:
+            self.pool.connection().execute('PRAGMA wal_checkpoint(FULL)')
+        except sqlite3.Error as e:
+            logging.error(f"Error checkpointing queued writes: {str(e)}")
+
+
+def get_writer(pool: ConnectionPool,
+               write_batch: BatchWriter,
+               batch_size: int = 64,
+               flush_interval: float = 0.05) -> WriteBehindWriter:
+    """
+    Get the shared write-behind writer for a database, starting it if needed.
+
+    One writer per database file keeps all queued writes in a single stream of
+    transactions, however many MemoryManager instances submit to it.
+
+    Args:
+        pool: Connection pool of the database
+        write_batch: Function writing a batch of items on a connection
+        batch_size: Maximum number of items per transaction, used when the writer is started
+        flush_interval: Seconds to wait for more items, used when the writer is started
+
+    Returns:
+        WriteBehindWriter: The running writer for that database
+    """
+    key = os.path.abspath(pool.db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer.closed or writer.pool is not pool:
+            if writer is not None:
+                writer.close()
+            writer = WriteBehindWriter(pool, write_batch, batch_size=batch_size, flush_interval=flush_interval)
+            _writers[key] = writer
+        return writer
+
+
+def close_writer(pool: ConnectionPool) -> None:
+    """Flush and stop the writer of a database, if one is running."""
+    with _writers_lock:
+        writer = _writers.pop(os.path.abspath(pool.db_path), None)
+    if writer is not None:
+        writer.close()
+
+
+@atexit.register
+def _close_all_writers():
+    """Flush every writer durably when the process exits."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
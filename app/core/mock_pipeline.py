@@ -1,12 +1,14 @@
 import logging
-import os
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 
-from core.llm.ollama_client import OllamaClient
-from core.memory.memory_manager import MemoryManager
+from core.llm.ollama_client import OllamaClient, ollama_hosts
+from core.llm.response_cache import get_response_cache
+from core.memory.memory_manager import DEFAULT_TENANT, MemoryManager
+from core.memory.retention import RetentionPolicy, start_retention_job
 from core.services.mock_text_to_image import MockTextToImageService
 from core.services.mock_image_to_3d import MockImageTo3DService
 from core.stub import Stub
+from core.utils.metrics import metrics
 from core.utils.resource_handler import ResourceHandler
 
 
@@ -20,31 +22,52 @@ class MockCreativePipeline:
     
     def __init__(self, 
                  stub: Optional[Stub] = None,
-                 ollama_host: str = None,
-                 ollama_model: str = "deepseek-r1:latest"):
+                 ollama_host: Optional[Union[str, List[str]]] = None,
+                 ollama_model: str = "deepseek-r1:latest",
+                 llm_options: Optional[Dict[str, Any]] = None,
+                 ollama_fallback_models: Optional[List[str]] = None,
+                 enhancement_bypass_threshold: Optional[float] = None,
+                 embedding_model: Optional[str] = None,
+                 tenant_id: str = DEFAULT_TENANT,
+                 retention_policy: Optional[RetentionPolicy] = None):
         """
         Initialize the mock pipeline with all required components.
         
         Args:
             stub: The Openfabric SDK Stub instance (can be None for mock pipeline)
-            ollama_host: Host address for Ollama
+            ollama_host: Host address for Ollama, or a list of hosts to balance across;
+                defaults to the OLLAMA_HOSTS environment variable
             ollama_model: Model to use for LLM
+            llm_options: Ollama generation options; deterministic settings
+                (temperature 0 or a fixed seed) enable the LLM response cache
+            ollama_fallback_models: Faster models to drop to when ollama_model is overloaded
+            enhancement_bypass_threshold: Detail score (0-1) at which prompts are used without
+                LLM enhancement, or None to always enhance
+            embedding_model: Ollama embedding model for finding past creations by meaning,
+                or None to only match them by keywords
+            tenant_id: User or tenant whose past creations are stored and recalled
+            retention_policy: Limits on kept history, enforced hourly in the background,
+                or None to keep everything
         """
         # Determine appropriate Ollama host
         if ollama_host is None:
-            # Check if running in Docker
-            if os.path.exists('/.dockerenv'):
-                # Use host.docker.internal to access host machine
-                ollama_host = "http://host.docker.internal:11434"
-            else:
-                # Default for local execution
-                ollama_host = "http://localhost:11434"
+            ollama_host = ollama_hosts()
         
         # Initialize components
         self.stub = stub
-        self.llm = OllamaClient(host=ollama_host, model=ollama_model)
+        self.enhancement_bypass_threshold = enhancement_bypass_threshold
         self.resource_handler = ResourceHandler()
-        self.memory = MemoryManager()
+        self.memory = MemoryManager(tenant_id=tenant_id)
+        self.llm = OllamaClient(host=ollama_host,
+                                model=ollama_model,
+                                options=llm_options,
+                                fallback_models=ollama_fallback_models,
+                                cache=get_response_cache(self.memory.db_path) if llm_options else None)
+        if embedding_model:
+            self.llm.embedding_model = embedding_model
+            self.memory.set_embedder(self.llm.embed)
+        if retention_policy is not None:
+            start_retention_job(self.memory.db_path, retention_policy)
         
         # Initialize mock services
         self.text_to_image = MockTextToImageService(stub, self.resource_handler)
@@ -76,14 +99,30 @@ class MockCreativePipeline:
         }
         
         try:
-            # Step 1: Get memory context if needed
-            memory_context = self.memory.get_memory_context(reference_query) if reference_query else None
-            
-            # Step 2: Enhance prompt with LLM
-            creative_response = self.llm.generate_creative_prompt(user_prompt, memory_context)
+            # Skip the LLM for prompts that are already detailed, unless they refer to past creations
+            bypass = False
+            if self.enhancement_bypass_threshold is not None and not reference_query:
+                score = self.llm.score_prompt(user_prompt)
+                metrics.observe("pipeline.prompt_score", score)
+                bypass = score >= self.enhancement_bypass_threshold
+                
+            if bypass:
+                logging.info("Prompt is already detailed, skipping LLM enhancement")
+                metrics.increment("pipeline.enhancement_skipped")
+                creative_response = self.llm.describe_locally(user_prompt)
+            else:
+                # Step 1: Get memory context if needed
+                memory_context = self.memory.get_memory_context(reference_query) if reference_query else None
+                
+                # Step 2: Enhance prompt with LLM
+                creative_response = self.llm.generate_creative_prompt(user_prompt, memory_context)
+                metrics.increment("pipeline.enhancement_llm")
+                
             enhanced_prompt = creative_response.get("enhanced_prompt", user_prompt)
             style_tags = creative_response.get("style_tags", [])
             mood = creative_response.get("mood", "unknown")
+            llm_model = creative_response.get("model")
+            llm_stats = creative_response.get("llm_stats", {})
             
             logging.info(f"Enhanced prompt: '{enhanced_prompt}'")
             result["enhanced_prompt"] = enhanced_prompt
@@ -114,6 +153,9 @@ class MockCreativePipeline:
             metadata = {
                 "style_tags": style_tags,
                 "mood": mood,
+                "llm_model": llm_model,
+                "llm_stats": llm_stats,
+                "enhancement_bypassed": bypass,
                 "image_metadata": image_metadata,
                 "model_metadata": model_metadata,
                 "mock": True
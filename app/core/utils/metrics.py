@@ -0,0 +1,77 @@
+import threading
+from typing import Any, Dict
+
+
+class Metrics:
+    """
+    Thread-safe in-process counters and value summaries.
+
+    Counters count events (e.g. skipped LLM calls). Observations keep a running
+    count, sum, minimum and maximum of a value (e.g. latencies or scores).
+    """
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self._counters: Dict[str, float] = {}
+        self._observations: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            name: Counter name
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a value in a summary.
+
+        Args:
+            name: Summary name
+            value: Observed value
+        """
+        with self._lock:
+            summary = self._observations.get(name)
+            if summary is None:
+                self._observations[name] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str) -> float:
+        """Get the current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a copy of all metrics.
+
+        Returns:
+            Dict with "counters" and "observations"; observations include their mean
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "observations": {
+                    name: {**summary, "mean": summary["sum"] / summary["count"]}
+                    for name, summary in self._observations.items()
+                }
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# Process-wide metrics registry
+metrics = Metrics()
@@ -1,5 +1,18 @@
+import logging
+
+from core.llm.ollama_client import OllamaClient, ollama_hosts
 from openfabric_pysdk.starter import Starter
 
+# Seconds to wait for the LLM to be loaded before accepting traffic anyway
+WARM_UP_TIMEOUT = 300
+
 if __name__ == '__main__':
     PORT = 8888
+
+    # Preload the model and keep it resident so requests do not pay for loading it
+    llm = OllamaClient(host=ollama_hosts())
+    llm.start_keep_alive()
+    if not llm.wait_until_ready(timeout=WARM_UP_TIMEOUT):
+        logging.warning("Ollama model is not loaded yet, accepting traffic anyway")
+
     Starter.ignite(debug=False, host="0.0.0.0", port=PORT),
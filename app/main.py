@@ -7,6 +7,8 @@ from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass
 from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass
 from openfabric_pysdk.context import AppModel, State
 from core.stub import Stub
+from core.llm.ollama_client import ollama_hosts
+from core.memory.memory_manager import DEFAULT_TENANT
 from core.pipeline import CreativePipeline
 from core.mock_pipeline import MockCreativePipeline
 
@@ -48,8 +50,15 @@ def execute(model: AppModel) -> None:
         model.response.message = "Error: No prompt provided"
         return
 
+    # Creations are stored and recalled per user, so refuse requests that cannot be attributed
+    uid = request_tenant()
+    if uid is None:
+        logging.error(f"Cannot tell which of the configured users {sorted(configurations)} sent the request")
+        model.response.message = "Error: Cannot determine the user for this request"
+        return
+
     # Retrieve user config
-    user_config: ConfigClass = configurations.get('super-user', None)
+    user_config: ConfigClass = configurations.get(uid, None)
     logging.info(f"Configurations: {configurations}")
 
     # Initialize the Stub with app IDs
@@ -62,6 +71,7 @@ def execute(model: AppModel) -> None:
         app_ids.append('69543f29-4d41-4afc-7f29-3d51591f11eb')  # Image-to-3D app
     
     stub = Stub(app_ids)
+    ollama_host = ollama_hosts()
     
     # Extract reference query if present
     reference_query = extract_reference_query(user_prompt)
@@ -71,7 +81,7 @@ def execute(model: AppModel) -> None:
     try:
         logging.info("Testing connection to Openfabric services...")
         # Create a test pipeline to check if services are available
-        test_pipeline = CreativePipeline(stub)
+        test_pipeline = CreativePipeline(stub, ollama_host=ollama_host)
         # Try to get schema which will test the connection
         text_to_image_schema = test_pipeline.text_to_image.get_schema()
         if text_to_image_schema:
@@ -84,10 +94,10 @@ def execute(model: AppModel) -> None:
     # Initialize and run the appropriate pipeline
     if use_mock:
         logging.warning("Using MOCK pipeline - Openfabric services unavailable")
-        pipeline = MockCreativePipeline(stub)
+        pipeline = MockCreativePipeline(stub, ollama_host=ollama_host, tenant_id=uid)
     else:
         logging.info("Using real pipeline with Openfabric services")
-        pipeline = CreativePipeline(stub)
+        pipeline = CreativePipeline(stub, ollama_host=ollama_host, tenant_id=uid)
     
     result = pipeline.process(user_prompt, reference_query)
     
@@ -117,6 +127,26 @@ def execute(model: AppModel) -> None:
                            f"Original prompt: '{user_prompt}'"
 
 
+def request_tenant() -> Optional[str]:
+    """
+    Determine the user whose configuration and memory a request uses.
+    
+    The SDK only identifies users through the config callback, so the tenant is
+    the user ID the stored configuration was saved under. Without any configuration
+    the app serves a single user under the default tenant.
+    
+    Returns:
+        The user ID, or None when several users are configured and the request
+        cannot be attributed to one of them
+    """
+    if not configurations:
+        logging.warning(f"No user configuration received, storing creations under '{DEFAULT_TENANT}'")
+        return DEFAULT_TENANT
+    if len(configurations) == 1:
+        return next(iter(configurations))
+    return None
+
+
 def extract_reference_query(prompt: str) -> Optional[str]:
     """
     Extract a reference query from a prompt if it contains specific patterns 
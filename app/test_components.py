@@ -84,6 +84,7 @@ def test_memory_system():
     else:
         print("✗ Failed to generate specific memory context for 'dragon'")
         
+    memory.close()
     print("\n=== Memory System Test Complete ===")
     return True
 
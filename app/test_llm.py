@@ -1,5 +1,8 @@
 import logging
+import os
 import sys
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -11,6 +14,10 @@ logging.basicConfig(
 )
 
 from core.llm.ollama_client import OllamaClient
+from core.llm.model_tiering import ModelTierPolicy
+from core.llm.response_cache import ResponseCache, get_response_cache
+from core.llm.stream_cleaner import StreamCleaner
+from core.llm.vocabulary import VocabularyMatcher
 
 def test_prompt_enhancement():
     """Test the basic prompt enhancement functionality"""
@@ -46,10 +53,150 @@ def test_creative_prompt_with_memory():
     logging.info(f"Detected style tags: {result['style_tags']}")
     logging.info(f"Detected mood: {result['mood']}")
 
+def test_stream_cleaner():
+    """Test incremental cleaning of streamed output against the batch cleaner"""
+    raw = "<think>\nThe user wants a dragon.\n</think>\n\nEnhanced prompt:\nA <b>majestic</b> dragon on a cliff,\nglowing scales at sunset."
+    
+    cleaner = StreamCleaner()
+    streamed = "".join(cleaner.feed(raw[i:i + 3]) for i in range(0, len(raw), 3)) + cleaner.finish()
+    
+    logging.info(f"\nStreamed cleaned output: '{streamed}'")
+    assert streamed == OllamaClient()._clean_llm_output(raw)
+    
+    # Only on request does a blank line after the prompt end generation early
+    cleaner = StreamCleaner(stop_at_paragraph=True, min_chars=10)
+    streamed = cleaner.feed("A majestic dragon on a cliff.\n\nThis prompt focuses on") + cleaner.finish()
+    assert streamed == "A majestic dragon on a cliff."
+    assert cleaner.done
+
+def test_response_cache():
+    """Test the two-tier LLM response cache"""
+    test_db_path = "datastore/test_llm_cache.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+        
+    cache = ResponseCache(db_path=test_db_path, max_entries=2)
+    key = ResponseCache.make_key("deepseek-r1:latest", "A dragon", {"seed": 42})
+    assert key != ResponseCache.make_key("deepseek-r1:latest", "A dragon", {"seed": 7})
+    
+    assert cache.get(key) is None
+    cache.put(key, "A majestic dragon")
+    assert cache.get(key) == "A majestic dragon"
+    
+    # A fresh cache falls through to the persistent tier
+    reopened = ResponseCache(db_path=test_db_path)
+    assert reopened.get(key) == "A majestic dragon"
+    assert reopened.memory.stats()["size"] == 1
+    
+    # Pipelines share one cache per database, so counters survive across requests
+    shared = get_response_cache(test_db_path)
+    assert get_response_cache(test_db_path) is shared
+    
+    # Expired rows are purged on a later write, not when a cache is opened
+    expiring = ResponseCache(db_path=test_db_path, ttl=60, purge_interval=2)
+    expiring.put("first", "A dragon")
+    expiring.put("second", "A castle")
+    conn = expiring.pool.connection()
+    with conn:
+        conn.execute('UPDATE llm_responses SET created_at = created_at - 3600')
+    expiring.put("third", "A robot")
+    assert conn.execute('SELECT cache_key FROM llm_responses').fetchall() == [("third",)]
+    
+    # Only deterministic generation options are cached
+    client = OllamaClient(cache=cache)
+    assert client._cache_key("A dragon", client.model) is None
+    client.options = {"temperature": 0}
+    assert client._cache_key("A dragon", client.model) is not None
+    
+    logging.info(f"\nResponse cache stats: {cache.stats()}")
+    for opened in (cache, reopened, shared, expiring):
+        opened.close()
+    os.remove(test_db_path)
+
+def test_vocabulary_matcher():
+    """Test single-pass style and mood extraction"""
+    matcher = VocabularyMatcher({
+        "styles": ["fantasy", "oil painting", "pop art", "sci-fi"],
+        "moods": ["dark", "light", "fantasy"]
+    })
+    
+    found = matcher.scan("A DARK fantasy oil   painting, lightning over a dark sci-fi city")
+    logging.info(f"\nVocabulary matches: {found}")
+    
+    assert found["styles"] == {"fantasy": 1, "oil painting": 1, "sci-fi": 1}
+    # Word boundaries keep "light" from matching inside "lightning"
+    assert found["moods"] == {"dark": 2, "fantasy": 1}
+    
+    tags = OllamaClient().extract_tags("A whimsical watercolor of a calm, calm lake")
+    assert tags["style_tags"] == ["watercolor"]
+    assert tags["mood"] == "calm"
+
+def test_model_tiering():
+    """Test dropping to cheaper models under load"""
+    policy = ModelTierPolicy(["deepseek-r1:latest", "llama3.2:1b"], max_queue_depth=1, p95_threshold=1.0, min_samples=1)
+    model = policy.acquire()
+    assert model == "deepseek-r1:latest"
+    
+    # A busy preferred model sends new requests to the fallback
+    fallback = policy.acquire()
+    assert fallback == "llama3.2:1b"
+    policy.release(fallback)
+    policy.release(model, latency=0.5)
+    
+    # Concurrent requests cannot overshoot the queue depth between choosing and reserving
+    depth_policy = ModelTierPolicy(["deepseek-r1:latest", "llama3.2:1b"], max_queue_depth=2)
+    barrier = threading.Barrier(16)
+    chosen = []
+    
+    def request():
+        barrier.wait()
+        chosen.append(depth_policy.acquire())
+    
+    threads = [threading.Thread(target=request) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert chosen.count("deepseek-r1:latest") == 2
+    
+    # Failed requests do not count towards the latency window
+    for _ in range(5):
+        policy.release(policy.acquire())
+    assert policy.stats()["deepseek-r1:latest"]["p95_latency"] == 0.5
+    
+    # A preferred model whose recent p95 latency is too high is skipped
+    policy.release(policy.acquire(), latency=5.0)
+    assert policy.acquire() == "llama3.2:1b"
+    
+    logging.info(f"\nModel tier stats: {policy.stats()}")
+
+def test_prompt_scoring():
+    """Test detail scoring used to bypass enhancement of detailed prompts"""
+    client = OllamaClient()
+    
+    bare = client.score_prompt("A dragon")
+    detailed = client.score_prompt(
+        "A majestic, glowing red dragon perched on a jagged cliff at sunset, dramatic golden lighting, "
+        "swirling mist below, intricate scales catching the light, epic fantasy oil painting with "
+        "rich, saturated colors and a moody, mysterious atmosphere, towering mountains fading into the distance"
+    )
+    logging.info(f"\nPrompt scores: bare={bare:.2f}, detailed={detailed:.2f}")
+    assert bare < 0.2 < 0.7 < detailed <= 1.0
+    
+    local = client.describe_locally("An epic fantasy oil painting of a dragon")
+    assert local["enhanced_prompt"] == "An epic fantasy oil painting of a dragon"
+    assert local["style_tags"] == ["fantasy", "oil painting"]
+    assert local["model"] is None
+
 if __name__ == "__main__":
     logging.info("Starting LLM functionality tests")
     
     test_prompt_enhancement()
     test_creative_prompt_with_memory()
+    test_stream_cleaner()
+    test_response_cache()
+    test_vocabulary_matcher()
+    test_model_tiering()
+    test_prompt_scoring()
     
     logging.info("LLM functionality tests completed") 
\ No newline at end of file
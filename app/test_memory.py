@@ -1,6 +1,12 @@
 import logging
 import sys
+import glob
+import io
+import json
 import os
+import shutil
+import sqlite3
+import threading
 import time
 
 # Configure logging
@@ -12,7 +18,14 @@ logging.basicConfig(
     ]
 )
 
-from core.memory.memory_manager import MemoryManager
+from core.memory.memory_manager import (ALL_TENANTS, DEFAULT_TENANT, FILTER_SQL, PAGE_NEWEST_FIRST_SQL,
+                                        PAGE_OLDEST_FIRST_SQL, RECENT_CONTEXT_SQL, RECENT_IDS_SQL, MemoryManager,
+                                        write_creations)
+from core.memory.bulk import export_ndjson, import_ndjson
+from core.memory.creation import Creation
+from core.memory.retention import RetentionJob, RetentionPolicy, iter_archived
+from core.memory.vector_index import VectorIndex, numpy_available
+from core.memory.write_behind import WriteBehindWriter
 
 def test_memory_storage_and_retrieval():
     """Test basic memory storage and retrieval functionality"""
@@ -113,8 +126,756 @@ def test_memory_storage_and_retrieval():
     
     context = memory.get_memory_context()  # Recent creations context
     logging.info(f"Generated context from recent creations:\n{context}")
+    
+    memory.close()
+
+def test_memory_context_budget():
+    """Test that memory context stays within its budget and skips duplicates"""
+    test_db_path = "datastore/test_memory_context.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+        
+    memory = MemoryManager(db_path=test_db_path)
+    long_prompt = "A majestic dragon perched on a craggy mountain peak. " + "Scales glisten in the sunlight. " * 40
+    memory.store_creation(user_prompt="A dragon on a mountain", enhanced_prompt=long_prompt)
+    memory.store_creation(user_prompt="A dragon on a mountain", enhanced_prompt=long_prompt)
+    memory.store_creation(user_prompt="A peaceful beach", enhanced_prompt="A tranquil beach at sunset.")
+    
+    stored = memory.get_recent_creations(limit=1)[0]
+    logging.info(f"\nStored summary: '{stored['summary']}'")
+    assert len(stored["summary"]) <= 200
+    
+    context = memory.get_memory_context("dragon", max_chars=300)
+    logging.info(f"Budgeted context for 'dragon':\n{context}")
+    assert len(context) <= 300
+    assert context.count("Previous creation") == 1
+    
+    context = memory.get_memory_context()
+    assert context.startswith("Previous creation: 'A peaceful beach'")
+    assert context.count("A dragon on a mountain") == 1
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_concurrent_access():
+    """Test that concurrent writers and readers share pooled WAL connections without lock errors"""
+    test_db_path = "datastore/test_memory_concurrency.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+        
+    memory = MemoryManager(db_path=test_db_path)
+    journal_mode = memory.pool.connection().execute('PRAGMA journal_mode').fetchone()[0]
+    assert journal_mode == "wal"
+    
+    workers, per_worker = 8, 25
+    ids = []
+    
+    def work(worker):
+        for i in range(per_worker):
+            ids.append(memory.store_creation(user_prompt=f"Worker {worker} dragon {i}",
+                                             enhanced_prompt=f"A dragon painted by worker {worker}"))
+            memory.search_creations("dragon", limit=3)
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    logging.info(f"\nStored and searched {len(ids)} creations from {workers} threads in {elapsed:.2f}s")
+    assert len(ids) == workers * per_worker
+    assert -1 not in ids and len(set(ids)) == len(ids)
+    
+    # Connections of finished threads are closed, only the main thread's is left
+    assert len(memory.pool._connections) == 1
+    for _ in range(200):
+        thread = threading.Thread(target=memory.search_creations, args=("dragon",))
+        thread.start()
+        thread.join()
+    assert len(memory.pool._connections) == 1
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_full_text_search():
+    """Test BM25-ranked full-text search, its backfill for old databases and the recency boost"""
+    test_db_path = "datastore/test_memory_fts.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    # A database from before the full-text index existed
+    conn = sqlite3.connect(test_db_path)
+    conn.execute('''
+    CREATE TABLE creations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, user_prompt TEXT NOT NULL,
+        enhanced_prompt TEXT NOT NULL, image_path TEXT, model_path TEXT, metadata TEXT, tags TEXT
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO creations (timestamp, user_prompt, enhanced_prompt, tags)
+    VALUES ('2024-01-01T12:00:00', 'An old castle', 'A ruined castle on a cliff with a dragon banner', '["castle"]')
+    ''')
+    conn.commit()
+    conn.close()
+    
+    memory = MemoryManager(db_path=test_db_path)
+    assert memory.fts_enabled
+    assert [c["user_prompt"] for c in memory.search_creations("castle")] == ["An old castle"]
+    
+    memory.store_creation(user_prompt="A dragon on a mountain",
+                          enhanced_prompt="A majestic dragon perched on a mountain peak",
+                          tags=["dragon", "mountain"])
+    memory.store_creation(user_prompt="A peaceful beach", enhanced_prompt="A tranquil beach at sunset")
+    
+    # Matches in the prompt and tags outrank a passing mention, and words match by prefix
+    results = memory.search_creations("drag")
+    logging.info(f"\nRanked results for 'drag': {[r['user_prompt'] for r in results]}")
+    assert [r["user_prompt"] for r in results] == ["A dragon on a mountain", "An old castle"]
+    assert memory.search_creations("peaceful sunset")[0]["user_prompt"] == "A peaceful beach"
+    assert memory.search_creations("submarine") == []
+    
+    # Every word must match, and stopwords are ignored
+    assert [r["user_prompt"] for r in memory.search_creations("the castle with a dragon")] == ["An old castle"]
+    
+    # The recency boost lifts today's creation over an older, more relevant one
+    memory.store_creation(user_prompt="A house by a lake", enhanced_prompt="A house by a lake with a castle on the hill")
+    assert memory.search_creations("castle")[0]["user_prompt"] == "An old castle"
+    results = memory.search_creations("castle", recency_weight=10.0)
+    assert results[0]["user_prompt"] == "A house by a lake"
+    
+    plan = " ".join(row[3] for row in memory.pool.connection().execute(
+        'EXPLAIN QUERY PLAN SELECT c.* FROM creations_fts JOIN creations c ON c.id = creations_fts.rowid '
+        'WHERE creations_fts MATCH ?', ('"dragon"*',)))
+    logging.info(f"Full-text query plan: {plan}")
+    assert "VIRTUAL TABLE INDEX" in plan and "SEARCH c USING INTEGER PRIMARY KEY" in plan
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_search_precision():
+    """Test that stopwords and short words do not make searches return unrelated creations"""
+    test_db_path = "datastore/test_memory_precision.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path)
+    for user_prompt, enhanced_prompt in [
+        ("A dragon on a mountain", "A majestic dragon perched on a mountain peak"),
+        ("A peaceful beach", "A tranquil beach at sunset with palm trees"),
+        ("A futuristic cityscape", "A neon city at night with flying cars"),
+        ("Make a robot", "A friendly robot made of polished chrome")
+    ]:
+        memory.store_creation(user_prompt=user_prompt, enhanced_prompt=enhanced_prompt)
+    
+    for query in ["a dragon", "the dragon I made", "like the dragon I created before"]:
+        results = [r["user_prompt"] for r in memory.search_creations(query)]
+        logging.info(f"\nResults for '{query}': {results}")
+        assert results == ["A dragon on a mountain"]
+        assert "robot" not in memory.get_memory_context(query)
+    
+    assert memory.search_creations("a the of") == []
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_tag_queries():
+    """Test whole-tag filters, tag counts and the tags table backfill"""
+    test_db_path = "datastore/test_memory_tags.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    # A creation stored before the tags table existed
+    conn = sqlite3.connect(test_db_path)
+    conn.execute('''
+    CREATE TABLE creations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, user_prompt TEXT NOT NULL,
+        enhanced_prompt TEXT NOT NULL, image_path TEXT, model_path TEXT, metadata TEXT, tags TEXT
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO creations (timestamp, user_prompt, enhanced_prompt, tags)
+    VALUES ('2024-01-01T12:00:00', 'A pop art cat', 'A cat in bold pop art colors', '["pop art", "Cat"]')
+    ''')
+    conn.commit()
+    conn.close()
+    
+    memory = MemoryManager(db_path=test_db_path)
+    memory.store_creation(user_prompt="A portrait", enhanced_prompt="An oil portrait", tags=["art", "Portrait"])
+    memory.store_creation(user_prompt="A digital city", enhanced_prompt="A neon city", tags=["digital art", "city"])
+    memory.store_creation(user_prompt="A sketch", enhanced_prompt="A pencil sketch of a cat", tags=["art", "cat"])
+    
+    # "art" only matches creations tagged exactly "art"
+    results = memory.search_creations("", tags_any=["ART"], limit=10)
+    assert sorted(r["user_prompt"] for r in results) == ["A portrait", "A sketch"]
+    
+    results = memory.search_creations("", tags_all=["art", "cat"], limit=10)
+    assert [r["user_prompt"] for r in results] == ["A sketch"]
+    
+    results = memory.search_creations("cat", tags_any=["pop art", "city"], limit=10)
+    assert [r["user_prompt"] for r in results] == ["A pop art cat"]
+    
+    counts = memory.get_tag_counts()
+    logging.info(f"\nTag counts: {counts}")
+    assert list(counts.items())[:2] == [("art", 2), ("cat", 2)]
+    assert counts["pop art"] == 1
+    
+    plan = " ".join(row[3] for row in memory.pool.connection().execute(
+        'EXPLAIN QUERY PLAN SELECT creation_id FROM creation_tags WHERE tenant_id = ? AND tag IN (?, ?)',
+        (DEFAULT_TENANT, "art", "cat")))
+    logging.info(f"Tag lookup query plan: {plan}")
+    assert "SEARCH creation_tags USING PRIMARY KEY (tenant_id=? AND tag=?)" in plan
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_recency_indexes():
+    """Test the epoch timestamp migration and that recency queries read indexes instead of sorting"""
+    test_db_path = "datastore/test_memory_recency.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    # Creations stored with ISO timestamps only, out of insertion order
+    conn = sqlite3.connect(test_db_path)
+    conn.execute('''
+    CREATE TABLE creations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, user_prompt TEXT NOT NULL,
+        enhanced_prompt TEXT NOT NULL, image_path TEXT, model_path TEXT, metadata TEXT, tags TEXT
+    )
+    ''')
+    conn.executemany('''
+    INSERT INTO creations (timestamp, user_prompt, enhanced_prompt) VALUES (?, ?, ?)
+    ''', [("2024-03-01T12:00:00", "A newer castle", "A castle"),
+          ("2024-01-01T12:00:00", "An older castle", "A castle")])
+    conn.commit()
+    conn.close()
+    
+    memory = MemoryManager(db_path=test_db_path)
+    memory.store_creation(user_prompt="A fresh dragon", enhanced_prompt="A dragon")
+    
+    recent = memory.get_recent_creations(limit=3)
+    assert [c["user_prompt"] for c in recent] == ["A fresh dragon", "A newer castle", "An older castle"]
+    assert recent[1]["created_at"] > recent[2]["created_at"] > 0
+    assert recent[2]["tenant_id"] == DEFAULT_TENANT
+    
+    def plan(sql, params):
+        rows = memory.pool.connection().execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return " ".join(row[3] for row in rows)
+    
+    tenant = " AND c.tenant_id = ?"
+    for sql in (RECENT_IDS_SQL, FILTER_SQL.format(columns="*", filters="{filters}"), RECENT_CONTEXT_SQL):
+        query_plan = plan(sql.format(filters=tenant), (DEFAULT_TENANT, 5))
+        logging.info(f"\nRecency query plan: {query_plan}")
+        assert "TEMP B-TREE" not in query_plan
+        assert "idx_creations_tenant_context (tenant_id=?)" in query_plan
+        
+        # Admin queries across all tenants walk the plain recency index
+        query_plan = plan(sql.format(filters=""), (5,))
+        assert "TEMP B-TREE" not in query_plan
+        assert "idx_creations_recent" in query_plan
+    assert "COVERING INDEX idx_creations_tenant_context" in plan(RECENT_CONTEXT_SQL.format(filters=tenant),
+                                                                 (DEFAULT_TENANT, 5))
+    
+    assert memory.get_memory_context().startswith("Previous creation: 'A fresh dragon'")
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_tenant_partitioning():
+    """Test that tenants sharing a database only see their own creations, and admins see all"""
+    test_db_path = "datastore/test_memory_tenants.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    alice = MemoryManager(db_path=test_db_path, tenant_id="alice")
+    bob = MemoryManager(db_path=test_db_path, tenant_id="user-bob")
+    alice_id = alice.store_creation(user_prompt="A red dragon", enhanced_prompt="A dragon", tags=["fantasy"])
+    bob_id = bob.store_creation(user_prompt="A blue dragon", enhanced_prompt="A dragon", tags=["fantasy", "ice"])
+    bob.store_creation(user_prompt="A user interface", enhanced_prompt="A dashboard", tags=["ui"])
+    
+    assert [c["id"] for c in alice.search_creations("dragon")] == [alice_id]
+    assert [c["id"] for c in bob.search_creations("dragon")] == [bob_id]
+    # Words never match the tenant ID itself
+    assert [c["user_prompt"] for c in bob.search_creations("user")] == ["A user interface"]
+    assert alice.search_creations("user") == []
+    
+    assert [c["id"] for c in alice.get_recent_creations(limit=10)] == [alice_id]
+    assert alice.get_creation_by_id(bob_id) is None
+    assert bob.get_creation_by_id(bob_id)["tenant_id"] == "user-bob"
+    assert [c["id"] for c in alice.iter_creations(tags_any=["fantasy"])] == [alice_id]
+    assert alice.get_tag_counts() == {"fantasy": 1}
+    assert "A blue dragon" not in alice.get_memory_context("dragon")
+    
+    admin = MemoryManager(db_path=test_db_path, tenant_id=ALL_TENANTS)
+    assert sorted(c["id"] for c in admin.search_creations("dragon")) == [alice_id, bob_id]
+    assert len(list(admin.iter_creations())) == 3
+    assert admin.get_tag_counts()["fantasy"] == 2
+    assert admin.get_creation_by_id(alice_id)["tenant_id"] == "alice"
+    assert admin.store_creation(user_prompt="A ghost", enhanced_prompt="A ghost") == -1
+    
+    for manager in (alice, bob, admin):
+        manager.close()
+    os.remove(test_db_path)
+
+def test_context_cache():
+    """Test that repeated memory contexts are cached until a creation is stored"""
+    test_db_path = "datastore/test_memory_context_cache.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path)
+    other = MemoryManager(db_path=test_db_path, tenant_id="other")
+    memory.store_creation(user_prompt="A red dragon", enhanced_prompt="A red dragon breathing fire")
+    
+    context = memory.get_memory_context("my dragon")
+    hits = memory.context_cache.stats()["hits"]
+    start = time.perf_counter()
+    for _ in range(1000):
+        assert memory.get_memory_context("my dragon") == context
+    elapsed = time.perf_counter() - start
+    logging.info(f"\nCached memory context: {elapsed * 1000:.3f} us per lookup")
+    assert memory.context_cache.stats()["hits"] == hits + 1000
+    
+    # Contexts are per tenant, and any stored creation invalidates them
+    assert other.get_memory_context("my dragon") == ""
+    memory.store_creation(user_prompt="A blue dragon", enhanced_prompt="A blue dragon in the ice")
+    assert "A blue dragon" in memory.get_memory_context("my dragon")
+    other.store_creation(user_prompt="A green dragon", enhanced_prompt="A green dragon")
+    assert "A green dragon" in other.get_memory_context("my dragon")
+    
+    # Closing one manager leaves the pool, and with it the caches and generation, to the others
+    other.close()
+    third = MemoryManager(db_path=test_db_path)
+    assert third.pool is memory.pool and not memory.pool.closed
+    assert third.get_memory_context("my dragon") == memory.get_memory_context("my dragon")
+    third.close()
+    memory.close()
+    assert memory.pool.closed
+    os.remove(test_db_path)
+
+def test_write_behind():
+    """Test that queued creations are committed in batches and flushed on close"""
+    test_db_path = "datastore/test_memory_write_behind.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path, write_behind=True, write_batch_size=32)
+    workers, per_worker = 4, 50
+    futures = []
+    
+    def work(worker):
+        for i in range(per_worker):
+            futures.append(memory.submit_creation(user_prompt=f"Worker {worker} dragon {i}",
+                                                  enhanced_prompt="A queued dragon",
+                                                  tags=["dragon", f"worker-{worker}"]))
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    submitted = time.perf_counter() - start
+    
+    creation_ids = [future.result(timeout=10) for future in futures]
+    stats = memory._writer().stats()
+    logging.info(f"\nQueued {len(futures)} creations in {submitted * 1000:.1f} ms, writer stats: {stats}")
+    assert sorted(creation_ids) == list(range(1, workers * per_worker + 1))
+    assert stats["batches"] < len(futures)
+    
+    # Every ID points at the creation it was returned for, with its tags
+    for future in futures[:10]:
+        creation = memory.get_creation_by_id(future.result())
+        worker = creation["user_prompt"].split()[1]
+        assert creation["tags"] == ["dragon", f"worker-{worker}"]
+    assert memory.store_creation(user_prompt="A direct dragon", enhanced_prompt="A dragon") == len(futures) + 1
+    
+    # Creations still queued at shutdown are written before the writer stops
+    pending = [memory.submit_creation(user_prompt="A late dragon", enhanced_prompt="A dragon") for _ in range(20)]
+    memory.close()
+    assert all(future.done() for future in pending)
+    
+    reopened = MemoryManager(db_path=test_db_path)
+    assert len(reopened.search_creations("", tags_any=["dragon"], limit=1000)) == workers * per_worker
+    assert reopened.get_recent_creations(limit=1)[0]["user_prompt"] == "A late dragon"
+    
+    reopened.close()
+    os.remove(test_db_path)
+
+def test_write_behind_bad_item():
+    """Test that a failing item in a queued batch does not fail the other items"""
+    test_db_path = "datastore/test_memory_write_behind_bad.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path, write_behind=True)
+    try:
+        memory.submit_creation(user_prompt=None, enhanced_prompt="A dragon")
+        assert False, "Expected a missing prompt to be rejected"
+    except ValueError:
+        pass
+    assert memory.store_creation(user_prompt=None, enhanced_prompt="A dragon") == -1
+    
+    # A row that only fails in the database, queued in the same batch as good ones
+    writer = WriteBehindWriter(memory.pool, write_creations, flush_interval=1.0)
+    good = [writer.submit(((DEFAULT_TENANT, "2024-01-01T00:00:00", 1704067200000, f"A castle {i}", "A castle",
+                            None, None, None, None, "A castle", f"castle-{i}"), [])) for i in range(10)]
+    bad = writer.submit(((DEFAULT_TENANT, "2024-01-01T00:00:00", 1704067200000, None, "A castle",
+                          None, None, None, None, "A castle", "castle-bad"), []))
+    writer.close()
+    assert all(isinstance(future.result(), int) for future in good)
+    assert isinstance(bad.exception(), sqlite3.IntegrityError)
+    assert writer.stats()["items"] == 10
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_session_memory():
+    """Test that session memory is bounded, keyed by creation ID and read through"""
+    test_db_path = "datastore/test_memory_session.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path, session_size=3)
+    creation_ids = [memory.store_creation(user_prompt=f"A dragon {i}", enhanced_prompt="A dragon",
+                                          metadata={"mood": "epic"}, tags=["dragon"]) for i in range(5)]
+    
+    # Creations stored within the same second no longer overwrite each other, and only the newest are kept
+    assert len(memory.session_memory) == 3
+    assert all(creation_id in memory.session_memory for creation_id in creation_ids[-3:])
+    
+    # Reads of recent creations are served from session memory, matching what the database returns
+    recent = memory.get_recent_creations(limit=3)
+    assert memory.session_stats()["hits"] == 3
+    stored = MemoryManager(db_path=test_db_path)
+    stored.session_memory.clear()
+    assert recent == stored.get_recent_creations(limit=3)
+    assert recent[0]["metadata"] == {"mood": "epic"} and recent[0]["tags"] == ["dragon"]
+    
+    # Older creations are read from the database once, then from session memory
+    memory.session_memory.clear()
+    assert memory.get_creation_by_id(creation_ids[0])["user_prompt"] == "A dragon 0"
+    assert memory.get_creation_by_id(creation_ids[0])["user_prompt"] == "A dragon 0"
+    assert memory.get_creation_by_id(12345) is None
+    stats = memory.session_stats()
+    logging.info(f"\nSession memory stats: {stats}")
+    assert stats["size"] == 1
+    
+    # Results are copies
+    recent[0]["user_prompt"] = "Changed"
+    assert memory.get_recent_creations(limit=1)[0]["user_prompt"] == "A dragon 4"
+    
+    memory.close()
+    stored.close()
+    os.remove(test_db_path)
+
+def test_iter_creations():
+    """Test keyset-paginated iteration over the whole history"""
+    test_db_path = "datastore/test_memory_iter.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path)
+    for i in range(250):
+        memory.store_creation(user_prompt=f"Creation {i}", enhanced_prompt="A creation",
+                              tags=["even" if i % 2 == 0 else "odd"])
+    
+    newest_first = [creation["id"] for creation in memory.iter_creations(chunk_size=40)]
+    assert newest_first == [creation["id"] for creation in memory.get_recent_creations(limit=250)]
+    assert sorted(newest_first) == list(range(1, 251))
+    
+    oldest_first = [creation["id"] for creation in memory.iter_creations(chunk_size=40, newest_first=False)]
+    assert oldest_first == newest_first[::-1]
+    
+    # Resuming after a processed creation continues exactly where the iteration stopped
+    iterator = memory.iter_creations(chunk_size=40)
+    processed = [next(iterator) for _ in range(100)]
+    last = processed[-1]
+    rest = [creation["id"] for creation in memory.iter_creations(chunk_size=40, after=(last["created_at"], last["id"]))]
+    assert [creation["id"] for creation in processed] + rest == newest_first
+    
+    odd = list(memory.iter_creations(chunk_size=40, tags_any=["odd"]))
+    assert len(odd) == 125 and all(creation["tags"] == ["odd"] for creation in odd)
+    
+    for sql in (PAGE_NEWEST_FIRST_SQL, PAGE_OLDEST_FIRST_SQL):
+        plan = " ".join(row[3] for row in memory.pool.connection().execute(
+            f"EXPLAIN QUERY PLAN {sql.format(filters=' AND c.tenant_id = ?')}", (0, 0, DEFAULT_TENANT, 40)))
+        logging.info(f"\nPage query plan: {plan}")
+        assert "idx_creations_tenant_context" in plan and "TEMP B-TREE" not in plan
+        assert "created_at" in plan  # a range seek, not a scan from the start of the tenant's rows
+    
+    memory.close()
+    os.remove(test_db_path)
+
+def test_creation_records():
+    """Test that creation records decode JSON lazily and behave like dictionaries"""
+    test_db_path = "datastore/test_memory_records.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+    
+    memory = MemoryManager(db_path=test_db_path)
+    creation_id = memory.store_creation(user_prompt="A dragon", enhanced_prompt="A red dragon",
+                                        metadata={"mood": "epic"}, tags=["dragon"])
+    
+    creation = memory.search_creations("dragon")[0]
+    assert isinstance(creation, Creation)
+    assert creation._metadata_json == '{"mood": "epic"}' and creation._metadata is not None
+    assert creation["metadata"] == {"mood": "epic"} and creation.tags == ["dragon"]
+    assert creation == memory.get_creation_by_id(creation_id)
+    assert dict(creation)["user_prompt"] == "A dragon"
+    assert creation.get("similarity") is None and "similarity" not in creation
+    assert not hasattr(creation, "__dict__")
+    
+    # Only the selected columns are loaded
+    projected = memory.search_creations("dragon", fields=["id", "user_prompt"])[0]
+    assert dict(projected) == {"id": creation_id, "user_prompt": "A dragon"}
+    try:
+        projected["enhanced_prompt"]
+        assert False, "Expected a KeyError for a column that was not selected"
+    except KeyError:
+        pass
+    
+    # Copies and extra fields do not affect the original
+    copy = creation.copy()
+    copy["similarity"] = 0.5
+    copy["tags"] = ["changed"]
+    assert "similarity" not in creation and creation["tags"] == ["dragon"]
+    
+    memory.close()
+    os.remove(test_db_path)
+
+# Words sharing a meaning share a dimension, standing in for a real embedding model
+CONCEPTS = {"castle": 0, "fortress": 0, "medieval": 0, "keep": 0,
+            "dragon": 1, "wyvern": 1, "beach": 2, "sea": 2, "shore": 2}
+
+def concept_embedder(text):
+    vector = [0.0] * 4
+    for word in text.lower().replace(".", " ").split():
+        vector[CONCEPTS.get(word, 3)] += 1.0 if word in CONCEPTS else 0.1
+    return vector
+
+def test_semantic_memory():
+    """Test that creations are found by meaning through the embedding index"""
+    if not numpy_available():
+        logging.info("NumPy not installed, skipping semantic memory test")
+        return
+    
+    test_db_path = "datastore/test_memory_semantic.db"
+    for path in glob.glob("datastore/test_memory_semantic*"):
+        os.remove(path)
+    
+    memory = MemoryManager(db_path=test_db_path, embedder=concept_embedder)
+    fortress_id = memory.store_creation(user_prompt="A medieval fortress", enhanced_prompt="A stone fortress on a hill")
+    memory.store_creation(user_prompt="A wyvern", enhanced_prompt="A green wyvern in flight")
+    memory.store_creation(user_prompt="A quiet shore", enhanced_prompt="Waves on a sandy shore")
+    
+    # "castle" shares no word with the fortress, so keyword search misses it
+    assert memory.search_creations("castle") == []
+    results = memory.search_similar("the castle", limit=1)
+    logging.info(f"\nSimilar to 'the castle': {[(r['user_prompt'], round(r['similarity'], 2)) for r in results]}")
+    assert results[0]["id"] == fortress_id and results[0]["similarity"] > 0.9
+    assert "A medieval fortress" in memory.get_memory_context("castle", limit=1)
+    
+    # The index is persisted next to the database
+    memory.vectors.flush()
+    reopened = VectorIndex(memory.vectors.path)
+    assert reopened.count == 3
+    assert reopened.search(concept_embedder("dragon"), k=1)[0][0] == fortress_id + 1
+    
+    memory.close()
+    for path in glob.glob("datastore/test_memory_semantic*"):
+        os.remove(path)
+
+def test_retention():
+    """Test that expired creations are archived, deleted with their artifacts and forgotten everywhere"""
+    test_db_path = "datastore/test_memory_retention.db"
+    artifact_dir = "datastore/test_memory_retention_images"
+    for path in glob.glob("datastore/test_memory_retention*"):
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    os.makedirs(artifact_dir)
+    
+    alice = MemoryManager(db_path=test_db_path, tenant_id="alice",
+                          embedder=concept_embedder if numpy_available() else None)
+    bob = MemoryManager(db_path=test_db_path, tenant_id="bob")
+    old_ids = []
+    for i in range(3):
+        image_path = os.path.join(artifact_dir, f"image_{i}.png")
+        with open(image_path, "wb") as f:
+            f.write(b"x" * 100)
+        old_ids.append(alice.store_creation(user_prompt=f"An old castle {i}", enhanced_prompt="A castle",
+                                            image_path=image_path, tags=["old"]))
+    # Backdate them beyond the age limit
+    with alice.pool.connection() as conn:
+        conn.execute('UPDATE creations SET created_at = created_at - ? WHERE id IN (?, ?, ?)',
+                     (40 * 86400000, *old_ids))
+    recent_id = alice.store_creation(user_prompt="A new castle", enhanced_prompt="A castle")
+    bob_ids = [bob.store_creation(user_prompt=f"A lake {i}", enhanced_prompt="A lake") for i in range(5)]
+    assert alice.get_creation_by_id(old_ids[0]) is not None  # now in session memory
+    
+    reports = []
+    job = RetentionJob(test_db_path, RetentionPolicy(max_age_days=30, max_per_tenant=3),
+                       artifact_dirs=[artifact_dir], batch_size=2, pause=0, on_progress=reports.append)
+    job.start()
+    assert job.wait(10)
+    progress = job.progress()
+    logging.info(f"\nRetention progress: {progress}")
+    assert progress["state"] == "done" and progress["archived"] == 5
+    assert progress["files_deleted"] == 3 and progress["bytes_freed"] == 300
+    assert {report["phase"] for report in reports} >= {"age", "count", "compact"}
+    assert os.listdir(artifact_dir) == []
+    # New databases let the job return freed pages to the OS
+    assert alice.pool.connection().execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    
+    assert alice.get_creation_by_id(old_ids[0]) is None
+    assert [c["id"] for c in alice.search_creations("castle")] == [recent_id]
+    assert alice.get_tag_counts() == {}
+    assert [c["id"] for c in bob.get_recent_creations(limit=10)] == bob_ids[:1:-1]
+    if numpy_available():
+        assert [c["id"] for c in alice.search_similar("castle", limit=5)] == [recent_id]
+    
+    archived = list(iter_archived(job.archive_path))
+    assert sorted(c["id"] for c in archived) == sorted(old_ids + bob_ids[:2])
+    assert [c["user_prompt"] for c in iter_archived(job.archive_path, tenant_id="bob")] == ["A lake 0", "A lake 1"]
+    
+    # A size limit below what remains archives everything, oldest first
+    assert RetentionJob(test_db_path, RetentionPolicy(max_bytes=0), artifact_dirs=[artifact_dir],
+                        pause=0).run()["archived"] == 4
+    assert list(alice.iter_creations()) == []
+    
+    alice.close()
+    for path in glob.glob("datastore/test_memory_retention*"):
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+def test_bulk_import_export():
+    """Test NDJSON export and batched import with duplicate detection"""
+    source_path = "datastore/test_memory_export_source.db"
+    target_path = "datastore/test_memory_export_target.db"
+    export_path = "datastore/test_memory_export.ndjson"
+    for path in (source_path, target_path, export_path):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    for tenant_id, count in (("alice", 1500), ("bob", 500)):
+        source = MemoryManager(db_path=source_path, tenant_id=tenant_id, write_behind=True)
+        for i in range(count):
+            source.submit_creation(user_prompt=f"A {tenant_id} dragon {i}", enhanced_prompt="A dragon",
+                                   metadata={"seed": i}, tags=["dragon", "even" if i % 2 == 0 else "odd"])
+        source.close()
+    
+    admin_source = MemoryManager(db_path=source_path, tenant_id=ALL_TENANTS)
+    assert export_ndjson(admin_source, export_path, chunk_size=300) == 2000
+    with open(export_path, "a") as f:
+        f.write('{"user_prompt": "No enhanced prompt"}\n')
+    
+    target = MemoryManager(db_path=target_path, tenant_id=ALL_TENANTS)
+    
+    # Another writer keeps storing creations while the import runs, one batch at a time
+    carol = MemoryManager(db_path=target_path, tenant_id="carol")
+    importing = threading.Event()
+    carol_ids = []
+    
+    def write():
+        while importing.is_set() or not carol_ids:
+            carol_ids.append(carol.store_creation(user_prompt=f"A carol castle {len(carol_ids)}",
+                                                  enhanced_prompt="A castle"))
+    
+    importing.set()
+    writer = threading.Thread(target=write)
+    writer.start()
+    start = time.perf_counter()
+    stats = import_ndjson(target, export_path, batch_size=700)
+    logging.info(f"\nImported 2000 creations in {time.perf_counter() - start:.3f}s: {stats}")
+    importing.clear()
+    writer.join()
+    assert stats == {"imported": 2000, "duplicates": 0, "invalid": 1}
+    assert -1 not in carol_ids
+    assert len(carol.search_creations("castle", limit=len(carol_ids) + 1)) == len(carol_ids)
+    # Importing the same file again only finds duplicates
+    assert import_ndjson(target, export_path)["duplicates"] == 2000
+    
+    alice = MemoryManager(db_path=target_path, tenant_id="alice")
+    assert [c["user_prompt"] for c in alice.search_creations("dragon 1499", limit=1)] == ["A alice dragon 1499"]
+    assert alice.get_tag_counts() == {"dragon": 1500, "even": 750, "odd": 750}
+    assert alice.get_recent_creations(limit=1)[0]["metadata"] == {"seed": 1499}
+    indexes = {row[0] for row in target.pool.connection().execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+    assert {"idx_creations_recent", "idx_creations_tenant_context", "creations_fts_insert"} <= indexes
+    
+    # Exports round-trip: the imported creations export exactly like the originals
+    with open(export_path) as f:
+        original = [json.loads(line) for line in f][:-1]
+    exported = io.StringIO()
+    export_ndjson(target, exported)
+    reimported = [json.loads(line) for line in exported.getvalue().splitlines()]
+    reimported = [c for c in reimported if c["tenant_id"] != "carol"]
+    assert [{k: v for k, v in c.items() if k != "id"} for c in reimported] == \
+        [{k: v for k, v in c.items() if k != "id"} for c in original]
+    
+    for manager in (admin_source, target, carol, alice):
+        manager.close()
+    for path in (source_path, target_path, export_path):
+        os.remove(path)
+
+def test_vector_index_quantizer():
+    """Test growth, IVF search recall and search latency of the vector index"""
+    if not numpy_available():
+        logging.info("NumPy not installed, skipping vector index test")
+        return
+    import numpy as np
+    
+    index_path = "datastore/test_vector_index"
+    for path in glob.glob(f"{index_path}*"):
+        os.remove(path)
+    
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(20000, 64)).astype(np.float32)
+    index = VectorIndex(index_path, ivf_threshold=10 ** 9, nprobe=16, initial_capacity=16)
+    for creation_id, vector in enumerate(vectors):
+        index.add(creation_id, vector)
+    assert index.count == len(vectors)
+    
+    queries = vectors[:200] + rng.normal(scale=0.1, size=(200, 64)).astype(np.float32)
+    start = time.perf_counter()
+    exact = [index.search(query, k=1)[0][0] for query in queries]
+    brute_force_ms = (time.perf_counter() - start) / len(queries) * 1000
+    assert exact == list(range(200))
+    
+    index.train()
+    start = time.perf_counter()
+    approximate = [index.search(query, k=1)[0][0] for query in queries]
+    ivf_ms = (time.perf_counter() - start) / len(queries) * 1000
+    recall = sum(a == e for a, e in zip(approximate, exact)) / len(queries)
+    logging.info(f"\nVector search: brute force {brute_force_ms:.2f} ms, IVF {ivf_ms:.2f} ms, "
+                 f"recall@1 {recall:.2f}, {index.stats()}")
+    assert recall >= 0.9
+    
+    # Rows added after training are searchable through their list
+    index.add(99999, vectors[0] * -1)
+    assert index.search(vectors[0] * -1, k=1)[0][0] == 99999
+    
+    index.flush()
+    for path in glob.glob(f"{index_path}*"):
+        os.remove(path)
 
 if __name__ == "__main__":
     logging.info("Starting memory functionality tests")
     test_memory_storage_and_retrieval()
+    test_memory_context_budget()
+    test_concurrent_access()
+    test_full_text_search()
+    test_search_precision()
+    test_tag_queries()
+    test_recency_indexes()
+    test_tenant_partitioning()
+    test_context_cache()
+    test_write_behind()
+    test_write_behind_bad_item()
+    test_session_memory()
+    test_iter_creations()
+    test_creation_records()
+    test_semantic_memory()
+    test_vector_index_quantizer()
+    test_retention()
+    test_bulk_import_export()
     logging.info("Memory functionality tests completed") 
\ No newline at end of file
@@ -0,0 +1,138 @@
+import logging
+import os
+import sys
+import time
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+
+from core.llm.ollama_client import CREATIVE_SYSTEM_PROMPT, OllamaClient
+from core.llm.response_cache import ResponseCache
+from core.llm.stand_in_server import DEFAULT_RESPONSE, OllamaStandIn
+
+def test_generation_against_stand_in():
+    """Test prompt enhancement, prefix reuse and token accounting without a real Ollama"""
+    with OllamaStandIn() as stand_in:
+        client = OllamaClient(host=stand_in.url)
+
+        result = client.generate_creative_prompt("A dragon on a mountain")
+        logging.info(f"Enhanced prompt: '{result['enhanced_prompt']}'")
+        assert result["enhanced_prompt"] == DEFAULT_RESPONSE
+        assert "fantasy" in result["style_tags"]
+        assert result["model"] == "deepseek-r1:latest"
+        assert result["llm_stats"]["eval_count"] > 0
+
+        # The static system prompt goes in the system message, one request per prompt, so the
+        # server's prompt cache only evaluates it for the first request
+        second = client.generate_creative_prompt("A castle by the sea")
+        generations = [r for r in stand_in.requests if r["path"] == "/api/generate"]
+        assert len(generations) == 2
+        assert all(r["system"] == CREATIVE_SYSTEM_PROMPT.strip() and "raw" not in r for r in generations)
+        assert second["llm_stats"]["prompt_eval_count"] < len(CREATIVE_SYSTEM_PROMPT.split())
+
+        embedding = client.embed("A dragon on a mountain")
+        assert len(embedding) == stand_in.embedding_dim
+        assert embedding == stand_in.embedding("A dragon on a mountain")
+
+def test_streaming_against_stand_in():
+    """Test streamed generation with thinking removal and the token budget"""
+    with OllamaStandIn(token_latency=0.001) as stand_in:
+        client = OllamaClient(host=stand_in.url, stream=True)
+
+        fragments = list(client.stream_creative_prompt("A dragon on a mountain"))
+        logging.info(f"Received {len(fragments)} streamed fragments")
+        assert "".join(fragments) == DEFAULT_RESPONSE
+
+        client.stream_token_budget = 30
+        result = client.generate_creative_prompt("A dragon on a mountain")
+        assert result["llm_stats"]["stopped_early"]
+        assert len(result["enhanced_prompt"]) < len(DEFAULT_RESPONSE)
+
+def test_streaming_multi_paragraph_response():
+    """Test that blank lines in a formatted response do not end streaming early"""
+    response = ("**Majestic Dragon Perched on a Mountain at Sunset**\n\n"
+                "A colossal dragon with crimson scales grips a jagged peak, wings half unfurled.\n\n"
+                "- **Lighting:** low golden sunlight rim-lights the scales\n"
+                "- **Mood:** epic and mysterious\n\n"
+                "Rendered as a richly textured fantasy oil painting.")
+    with OllamaStandIn(response_text=response) as stand_in:
+        batch = OllamaClient(host=stand_in.url).generate_creative_prompt("A dragon on a mountain")
+        streamed = OllamaClient(host=stand_in.url, stream=True).generate_creative_prompt("A dragon on a mountain")
+        assert streamed["enhanced_prompt"] == batch["enhanced_prompt"]
+        assert "oil painting" in streamed["enhanced_prompt"]
+        assert not streamed["llm_stats"].get("stopped_early")
+
+def test_cache_and_failover_against_stand_in():
+    """Test that cached prompts skip the LLM and that failing hosts are avoided"""
+    test_db_path = "datastore/test_ollama_cache.db"
+    if os.path.exists(test_db_path):
+        os.remove(test_db_path)
+
+    with OllamaStandIn() as healthy, OllamaStandIn(error_rate=1.0) as failing:
+        client = OllamaClient(host=[failing.url, healthy.url],
+                              max_retries=0,
+                              options={"seed": 42},
+                              cache=ResponseCache(db_path=test_db_path))
+
+        for _ in range(3):
+            result = client.generate_creative_prompt("A dragon on a mountain")
+            assert result["enhanced_prompt"] == DEFAULT_RESPONSE
+
+        stats = client.host_stats()
+        logging.info(f"Host stats: {stats}")
+        assert not stats[failing.url]["healthy"]
+        assert client.cache.stats()["hits"] == 2
+
+        # Clients of the same hosts share their health, so a new client skips the failing host
+        other = OllamaClient(host=[failing.url, healthy.url], max_retries=0)
+        assert other.hosts is client.hosts
+        other.generate_creative_prompt("A castle by the sea")
+        assert other.host_stats()[failing.url]["requests"] == stats[failing.url]["requests"]
+
+    client.cache.close()
+    os.remove(test_db_path)
+
+def test_read_timeout_not_retried():
+    """Test that a generation is not sent again after its response timed out"""
+    with OllamaStandIn(token_latency=0.05) as stand_in:
+        client = OllamaClient(host=stand_in.url, read_timeout=0.2, prefix_cache=False)
+
+        client.generate_creative_prompt("A dragon on a mountain")
+        generations = [r for r in stand_in.requests if r["path"] == "/api/generate"]
+        assert len(generations) == 1
+
+def benchmark_client(requests_count: int = 20, token_latency: float = 0.005):
+    """Measure client overhead for non-streaming, streaming and cached generations"""
+    with OllamaStandIn(token_latency=token_latency) as stand_in:
+        modes = {
+            "non-streaming": OllamaClient(host=stand_in.url),
+            "streaming": OllamaClient(host=stand_in.url, stream=True),
+            "cached": OllamaClient(host=stand_in.url, options={"temperature": 0},
+                                   cache=ResponseCache(db_path="datastore/benchmark_cache.db"))
+        }
+        for name, client in modes.items():
+            start = time.perf_counter()
+            for _ in range(requests_count):
+                client.generate_creative_prompt("A dragon on a mountain")
+            elapsed = time.perf_counter() - start
+            logging.info(f"{name}: {elapsed / requests_count * 1000:.1f} ms per request")
+    modes["cached"].cache.close()
+    os.remove("datastore/benchmark_cache.db")
+
+if __name__ == "__main__":
+    logging.info("Starting Ollama client tests against the local stand-in")
+
+    test_generation_against_stand_in()
+    test_streaming_against_stand_in()
+    test_streaming_multi_paragraph_response()
+    test_cache_and_failover_against_stand_in()
+    test_read_timeout_not_retried()
+    benchmark_client()
+
+    logging.info("Ollama client tests completed")